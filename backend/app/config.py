@@ -54,6 +54,13 @@ class Settings(BaseSettings):
     transcription_vlm_provider: str = "openai"
     transcription_vlm_model: str = "gpt-4o"
     transcription_debug_dump: bool = False  # gate debug file writes in production
+    # Directory for the exact-match VLM response cache (CachedVLMProvider).
+    # None disables it — intended for dev/eval re-runs, not multi-instance prod.
+    transcription_vlm_cache_dir: Optional[str] = None
+    # Share VLM calls across concurrently uploaded PDFs (VLMBatchDispatcher).
+    # Multi-image replies carry no per-page logprobs, so pages transcribed
+    # this way get no S11 min_span_logprob and never raise vlm_low_logprob.
+    transcription_batch_dispatch: bool = False
 
     # Transcription engine selector.
     #   "legacy"    — HandwritingTranscriptionService (S4 architecture; default)
@@ -128,6 +135,15 @@ class Settings(BaseSettings):
     frontend_base_url: str = "https://vivi-assistant.com"  # Production domain
     rubric_generation_model: str = "gpt-4o"
     rubric_llm_timeout_seconds: int = 60
+    # Client-side pacing for rubric generation calls; match the OpenAI tier
+    # limits of rubric_generation_model so requests queue instead of hitting 429s
+    rubric_openai_rpm: int = 5000
+    rubric_openai_tpm: int = 450000
+    rubric_max_concurrency: int = 8  # criteria LLM calls in flight at once per rubric
+    # Directory for the on-disk cache of generated criteria (keyed by request).
+    # None disables it — intended for dev/eval re-runs, not multi-instance prod.
+    rubric_cache_dir: Optional[str] = None
+    rubric_cache_ttl_days: int = 30
     
     # Grading Agent settings
     grading_timeout_seconds: int = 60  # Timeout for each LLM grading call
@@ -123,9 +123,9 @@ class PagePreview(BaseModel):
     """Preview of a single PDF page."""
     page_index: int = Field(..., description="0-based page index")
     page_number: int = Field(..., description="1-based page number for display")
-    thumbnail_base64: str = Field(..., description="Base64-encoded thumbnail image (PNG)")
-    width: int = Field(..., description="Original page width in pixels")
-    height: int = Field(..., description="Original page height in pixels")
+    thumbnail_base64: str = Field(..., description="Base64-encoded thumbnail image (JPEG)")
+    width: int = Field(..., description="Rendered preview width in pixels")
+    height: int = Field(..., description="Rendered preview height in pixels")
     page_pdf_url: Optional[str] = Field(None, description="Signed URL to individual page PDF")
 
 
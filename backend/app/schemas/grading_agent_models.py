@@ -102,23 +102,37 @@ class GradingQuestion:
 
 @dataclass
 class NormalizedRubric:
-    """Fully normalized rubric ready for grading."""
+    """
+    Fully normalized rubric ready for grading.
+    
+    The totals are stored, not recomputed on every read: normalize_rubric
+    passes the counts it accumulated while building the rubric, and any
+    total left as None is computed from `questions` at construction. Call
+    recompute() after mutating the questions.
+    """
     questions: List[GradingQuestion]
     name: Optional[str] = None
     description: Optional[str] = None
     programming_language: Optional[str] = None
+    total_points: Optional[float] = None
+    total_criteria: Optional[int] = None
+    total_rules: Optional[int] = None
     
-    @property
-    def total_points(self) -> float:
-        return sum(q.total_points for q in self.questions)
-    
-    @property
-    def total_criteria(self) -> int:
-        return sum(len(q.all_criteria) for q in self.questions)
+    def __post_init__(self):
+        if self.total_points is None or self.total_criteria is None or self.total_rules is None:
+            self.recompute()
     
-    @property
-    def total_rules(self) -> int:
-        return sum(len(c.rules) for q in self.questions for c in q.all_criteria)
+    def recompute(self) -> None:
+        """Recompute the stored totals from the questions."""
+        total_points = total_criteria = total_rules = 0
+        for q in self.questions:
+            total_points += q.total_points
+            criteria = q.all_criteria
+            total_criteria += len(criteria)
+            total_rules += sum(len(c.rules) for c in criteria)
+        self.total_points = total_points
+        self.total_criteria = total_criteria
+        self.total_rules = total_rules
 
 
 # =============================================================================
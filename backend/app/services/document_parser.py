@@ -10,7 +10,7 @@ import io
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from app.tracing import trace_if_enabled
 from pdf2image import convert_from_bytes
 from PIL import Image
@@ -19,8 +19,9 @@ from ..config import settings
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
+# Initialize OpenAI clients
 _client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
 
 
 def get_openai_client() -> OpenAI:
@@ -31,13 +32,24 @@ def get_openai_client() -> OpenAI:
     return _client
 
 
-def pdf_to_images(pdf_bytes: bytes, dpi: int = 150) -> List[Image.Image]:
+def get_async_openai_client() -> AsyncOpenAI:
+    """Get or create AsyncOpenAI client singleton (awaited directly, no worker thread)."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(api_key=settings.openai_api_key)
+    return _async_client
+
+
+def pdf_to_images(pdf_bytes: bytes, dpi: int = 150, max_size: Optional[int] = None) -> List[Image.Image]:
     """
     Convert PDF bytes to a list of PIL Images.
     
     Args:
         pdf_bytes: PDF file as bytes
         dpi: Resolution for rendering (150 is good balance of quality/size)
+        max_size: If set, Poppler renders each page with its longest side
+            scaled to this many pixels (in place of dpi), so callers that
+            only need small images don't rasterize pixels just to resize them
         
     Returns:
         List of PIL Image objects, one per page
@@ -46,9 +58,13 @@ def pdf_to_images(pdf_bytes: bytes, dpi: int = 150) -> List[Image.Image]:
         images = convert_from_bytes(
             pdf_bytes,
             dpi=dpi,
-            fmt='PNG'
+            fmt='PNG',
+            size=max_size,
         )
-        logger.info(f"Converted PDF to {len(images)} images at {dpi} DPI")
+        if max_size:
+            logger.info(f"Converted PDF to {len(images)} images at {max_size}px")
+        else:
+            logger.info(f"Converted PDF to {len(images)} images at {dpi} DPI")
         return images
     except Exception as e:
         logger.error(f"Error converting PDF to images: {e}")
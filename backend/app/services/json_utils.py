@@ -0,0 +1,30 @@
+"""
+JSON Helpers
+
+json.loads/json.dumps for LLM and VLM payloads, via orjson when it is
+installed: it handles the Hebrew- and code-heavy replies several times faster
+than stdlib json, and its JSONDecodeError subclasses json.JSONDecodeError,
+so callers catch the stdlib exception either way.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def json_loads(text: str) -> Any:
+    """json.loads, via orjson when it is installed."""
+    if HAS_ORJSON:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def json_dumps(obj: Any) -> str:
+    """Compact, non-ASCII-escaping json.dumps, via orjson when it is installed."""
+    if HAS_ORJSON:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,107 @@
+"""
+Micro-Batching for VLM Calls
+
+Shared collector behind VLMBatchDispatcher (grounded transcription) and
+BoundaryBatcher (boundary detection): callers submit one page at a time, and
+pages that arrive within a short window go out together in one multi-image
+call. Subclasses only build the prompt and split the reply.
+"""
+import asyncio
+from typing import Any, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+RequestT = TypeVar("RequestT")
+ResultT = TypeVar("ResultT")
+
+# Output cap for one multi-image call (gpt-4o allows 16,384 completion tokens)
+MAX_BATCH_TOKENS = 16000
+
+
+class MicroBatcher(Generic[RequestT, ResultT]):
+    """
+    Collects submitted requests into batches and runs each with _run_batch().
+
+    A collector task drains the queue into batches of up to `max_batch_size`
+    requests, waiting at most `max_wait` seconds after the first one for more
+    to arrive (eager batching), and dispatches each batch without blocking
+    collection of the next. _run_batch() returns one result per request, in
+    order; an exception fails every request in the batch. Requests whose
+    caller stopped waiting (timed out or cancelled) are dropped before the
+    call.
+
+    The queue and collector live on the event loop of the first submit;
+    share one batcher per loop (e.g. per web-server process).
+    """
+
+    def __init__(self, max_batch_size: int, max_wait: float):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[Tuple[RequestT, asyncio.Future]]"] = None
+        self._collector: Optional["asyncio.Task[None]"] = None
+        self._inflight: set = set()
+
+    async def _submit(self, request: RequestT) -> ResultT:
+        """Queue one request and wait for its result."""
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+        elif self._loop is not loop:
+            raise RuntimeError(f"{type(self).__name__} is bound to another event loop")
+        if self._collector is None or self._collector.done():
+            self._collector = loop.create_task(self._collect())
+
+        future = loop.create_future()
+        await self._queue.put((request, future))
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch without blocking collection of the next batch
+            task = loop.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[RequestT, asyncio.Future]]) -> None:
+        batch = [(request, future) for request, future in batch if not future.done()]
+        if not batch:
+            return
+        try:
+            results = await self._run_batch([request for request, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_batch(self, batch: List[RequestT]) -> List[ResultT]:
+        """Make the call for one batch; one result per request, in order."""
+        raise NotImplementedError
+
+
+def results_by_image_index(pages: Iterable[Any], image_count: int) -> List[Optional[Dict[str, Any]]]:
+    """
+    Match a multi-image reply's page entries to images 1..image_count by
+    their "image_index"; images the model left out (or indexed badly) get None.
+    """
+    by_index: Dict[int, Dict[str, Any]] = {}
+    for page_result in pages:
+        try:
+            by_index.setdefault(int(page_result.get("image_index")), page_result)
+        except (TypeError, ValueError, AttributeError):
+            continue
+    return [by_index.get(idx) for idx in range(1, image_count + 1)]
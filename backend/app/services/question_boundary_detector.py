@@ -23,6 +23,13 @@ Usage:
         sub_questions={"2": ["א", "ב"]},  # Optional
         page_number=1
     )
+
+    # Several pages at once (bounded concurrency, results in page order)
+    results = await detector.detect_boundaries_batch([
+        {"page_image_b64": "...", "raw_text": "...", "verified_text": "...",
+         "answered_questions": [1, 2], "page_number": 1},
+        ...
+    ])
 """
 
 import asyncio
@@ -30,17 +37,35 @@ import json
 import re
 import logging
 import time
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+from collections import Counter
+from functools import lru_cache
 from dataclasses import dataclass, field
 
+from .json_utils import json_loads
+from .micro_batcher import MAX_BATCH_TOKENS, MicroBatcher, results_by_image_index
+
 logger = logging.getLogger(__name__)
 
+
 # =============================================================================
 # Configuration
 # =============================================================================
 
 BOUNDARY_DETECTION_TIMEOUT = 8.0  # seconds (increased for sub-question detection)
+# A batched call echoes back every page's text, so pages sent through a
+# BoundaryBatcher get longer (including time queued for the batch)
+BOUNDARY_BATCH_TIMEOUT = 30.0  # seconds
 CONFIDENCE_THRESHOLD = 0.80  # Lowered slightly for sub-questions
+BOUNDARY_DETECTION_CONCURRENCY = 5  # pages in flight in detect_boundaries_batch
+
+# <Q2> or <Q2.א>: group 1 is the question number, group 2 the sub-question ID.
+# Compiled once for every scan in this module. The regex engine already skips
+# ahead on the literal "<Q" prefix, so a `'<Q' in text` pre-check only adds a
+# second pass over page-sized text (measured slower, marker-free or not).
+QUESTION_MARKER_RE = re.compile(r'<Q(\d+)(?:\.([^>]+))?>')
+# Outermost {...} in a VLM reply that may wrap its JSON in prose or fences
+_JSON_OBJECT_RE = re.compile(r'\{[\s\S]*\}')
 
 # =============================================================================
 # Prompts
@@ -168,6 +193,61 @@ marked_text: "int x = 5; return x * 2;"
 5. SUB-QUESTION FORMAT: Use <Q#.S> format (e.g., <Q2.א>, <Q1.A>)"""
 
 
+BOUNDARY_BATCH_PROMPT = """## CONTEXT
+You are analyzing {image_count} pages of handwritten computer science tests, one per image.
+The pages may come from DIFFERENT students. Treat every image on its own and only
+insert markers into the transcribed text given for THAT image.
+
+{page_blocks}
+
+## TASK
+For EACH image, find where each question/sub-question answer begins (margin
+numbers such as "1." or "2)", Hebrew/English sub-question letters such as "א." or
+"b)", centered or underlined headers such as "שאלה 2") and insert markers into
+that image's transcribed text:
+- <Q#> for main questions (e.g., <Q2>)
+- <Q#.S> for sub-questions (e.g., <Q2.א>, <Q1.A>)
+
+## OUTPUT FORMAT
+Return valid JSON:
+{{
+  "pages": [
+    {{
+      "image_index": 1,
+      "analysis": {{
+        "markers_found": [
+          {{
+            "question_number": 2,
+            "sub_question_id": null,
+            "visual_indicator": "שאלה 2 underlined at center top",
+            "location": "center",
+            "text_anchor": "public class Employee",
+            "confidence": 0.95
+          }}
+        ],
+        "reasoning": "..."
+      }},
+      "marked_text": "<Q2>public class Employee {{ ..."
+    }}
+  ]
+}}
+
+## IMPORTANT RULES
+1. One entry in "pages" per image, with its image_index (1 to {image_count})
+2. HIGH CONFIDENCE ONLY: Only insert markers when confidence > 0.80
+3. NO HALLUCINATION: If unsure, return that image's text unchanged
+4. PRESERVE TEXT: Never modify actual content
+5. VALID MARKERS ONLY: Use only the question numbers listed for that image"""
+
+
+BOUNDARY_BATCH_PAGE_BLOCK = """### Image {image_index} (page {page_number})
+The student answered: {answered_context}
+Valid question numbers: {answered_questions}
+<transcribed_text>
+{transcribed_text}
+</transcribed_text>"""
+
+
 # =============================================================================
 # Data Classes
 # =============================================================================
@@ -183,6 +263,16 @@ class BoundaryDetectionResult:
     used_fallback: bool = False
 
 
+@dataclass
+class _BoundaryRequest:
+    """One page queued in a BoundaryBatcher."""
+    page_image_b64: str
+    page_number: int
+    answered_questions: List[int]
+    answered_context: str
+    verified_text: str
+
+
 # =============================================================================
 # Question Boundary Detector
 # =============================================================================
@@ -195,14 +285,26 @@ class QuestionBoundaryDetector:
     at question/sub-question boundaries.
     """
     
-    def __init__(self, vlm_provider):
+    def __init__(
+        self,
+        vlm_provider,
+        max_concurrency: int = BOUNDARY_DETECTION_CONCURRENCY,
+        batcher: Optional["BoundaryBatcher"] = None,
+    ):
         """
         Initialize detector with a VLM provider.
         
         Args:
             vlm_provider: VLM provider instance (OpenAI, Anthropic, etc.)
+            max_concurrency: VLM calls in flight at once across all
+                detect_boundaries_batch calls on this detector
+            batcher: Optional shared BoundaryBatcher; pages then go out in
+                multi-image calls together with other callers' pages, under
+                BOUNDARY_BATCH_TIMEOUT
         """
         self.vlm_provider = vlm_provider
+        self.batcher = batcher
+        self._semaphore = asyncio.Semaphore(max_concurrency)
         
     async def detect_boundaries(
         self,
@@ -217,7 +319,10 @@ class QuestionBoundaryDetector:
         Detect question and sub-question boundaries, insert markers.
         
         Args:
-            page_image_b64: Base64-encoded page image
+            page_image_b64: Base64-encoded page image. Pass the same string
+                object the page was transcribed with: providers memoize
+                their decoded/wrapped image parts on it, and a str caches
+                its hash, so the payload isn't decoded or re-encoded again.
             raw_text: Raw transcription (for position reference)
             verified_text: Verified transcription (where markers are inserted)
             answered_questions: List of question numbers the student answered
@@ -258,17 +363,18 @@ class QuestionBoundaryDetector:
             )
         
         # Multiple questions OR has sub-questions → Use VLM
+        timeout_seconds = BOUNDARY_BATCH_TIMEOUT if self.batcher is not None else BOUNDARY_DETECTION_TIMEOUT
         try:
-            result = await asyncio.wait_for(
-                self._detect_with_vlm(
+            # asyncio.timeout cancels the call in place, without wait_for's
+            # extra wrapper Task per page
+            async with asyncio.timeout(timeout_seconds):
+                result = await self._detect_with_vlm(
                     page_image_b64=page_image_b64,
                     verified_text=verified_text,
                     answered_questions=answered_questions,
                     sub_questions=sub_questions,
                     page_number=page_number,
-                ),
-                timeout=BOUNDARY_DETECTION_TIMEOUT,
-            )
+                )
             
             elapsed_ms = int((time.time() - start_time) * 1000)
             logger.info(
@@ -287,7 +393,7 @@ class QuestionBoundaryDetector:
                 "boundary_detection_timeout",
                 extra={
                     "page_number": page_number,
-                    "timeout_seconds": BOUNDARY_DETECTION_TIMEOUT,
+                    "timeout_seconds": timeout_seconds,
                 }
             )
             return self._create_fallback_result(verified_text, answered_questions, "timeout")
@@ -302,6 +408,47 @@ class QuestionBoundaryDetector:
             )
             return self._create_fallback_result(verified_text, answered_questions, str(e))
     
+    async def detect_boundaries_batch(
+        self,
+        pages: List[Dict[str, Any]],
+    ) -> List[BoundaryDetectionResult]:
+        """
+        Detect boundaries for several pages concurrently.
+        
+        Pages share the detector's concurrency limit, so overlapping batches
+        (several graders at once) stay within it together.
+        
+        Args:
+            pages: One dict of detect_boundaries keyword arguments per page
+            
+        Returns:
+            One BoundaryDetectionResult per page, in input order
+        """
+        # The per-page timeout starts once a page holds a slot, so time spent
+        # queued for the semaphore never counts against it
+        async def bounded(page: Dict[str, Any]) -> BoundaryDetectionResult:
+            async with self._semaphore:
+                return await self.detect_boundaries(**page)
+        
+        results = await asyncio.gather(*(bounded(page) for page in pages), return_exceptions=True)
+        
+        # detect_boundaries already falls back on VLM errors; anything that
+        # still escapes (e.g. a malformed page dict) falls back for that page only
+        final: List[BoundaryDetectionResult] = []
+        for page, result in zip(pages, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                logger.warning(
+                    "boundary_detection_error",
+                    extra={"page_number": page.get("page_number"), "error": str(result)},
+                )
+                result = self._create_fallback_result(
+                    page.get("verified_text", ""), page.get("answered_questions") or [], str(result)
+                )
+            final.append(result)
+        return final
+    
     async def _detect_with_vlm(
         self,
         page_image_b64: str,
@@ -315,6 +462,18 @@ class QuestionBoundaryDetector:
         # Build answered context string
         answered_context = self._build_answered_context(answered_questions, sub_questions)
         
+        if self.batcher is not None:
+            page_result = await self.batcher.submit(
+                page_image_b64=page_image_b64,
+                page_number=page_number,
+                answered_questions=answered_questions,
+                answered_context=answered_context,
+                verified_text=verified_text,
+            )
+            if page_result is not None:
+                return self._parse_response(page_result, verified_text, answered_questions, sub_questions)
+            # The batched reply left this page out; detect it on its own
+        
         # Build prompt
         user_prompt = BOUNDARY_DETECTION_PROMPT.format(
             page_number=page_number,
@@ -323,17 +482,13 @@ class QuestionBoundaryDetector:
             transcribed_text=verified_text,
         )
         
-        # Run VLM call (sync → async wrapper)
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: self.vlm_provider.transcribe_images(
-                images_b64=[page_image_b64],
-                system_prompt=BOUNDARY_DETECTION_SYSTEM_PROMPT,
-                user_prompt=user_prompt,
-                max_tokens=4000,
-                temperature=0.0,  # Deterministic for boundary detection
-            )
+        # Native async client where the provider has one, else a worker thread
+        response = await self.vlm_provider.transcribe_images_async(
+            images_b64=[page_image_b64],
+            system_prompt=BOUNDARY_DETECTION_SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+            max_tokens=4000,
+            temperature=0.0,  # Deterministic for boundary detection
         )
         
         # Parse response
@@ -345,32 +500,36 @@ class QuestionBoundaryDetector:
         sub_questions: Dict[str, List[str]],
     ) -> str:
         """Build a human-readable context of answered questions and sub-questions."""
-        parts = []
-        for q in answered_questions:
-            q_str = str(q)
-            if q_str in sub_questions and sub_questions[q_str]:
-                subs = ", ".join(sub_questions[q_str])
-                parts.append(f"שאלה {q} (סעיפים: {subs})")
-            else:
-                parts.append(f"שאלה {q}")
-        return ", ".join(parts) if parts else "all questions"
+        # Only the answered questions' sub-questions affect the text, so key on those
+        return _answered_context(tuple(
+            (q, tuple(sub_questions.get(str(q)) or ()))
+            for q in answered_questions
+        ))
     
     def _parse_response(
         self,
-        response: str,
+        response: Union[str, Dict[str, Any]],
         original_text: str,
         answered_questions: List[int],
         sub_questions: Dict[str, List[str]],
     ) -> BoundaryDetectionResult:
-        """Parse VLM response with validation and fallbacks."""
+        """
+        Parse VLM response with validation and fallbacks.
+        
+        response is the raw reply, or one page's already-parsed entry from a
+        batched reply.
+        """
         
         try:
-            # Extract JSON from response
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if not json_match:
-                raise ValueError("No JSON found in response")
-                
-            data = json.loads(json_match.group())
+            if isinstance(response, dict):
+                data = response
+            else:
+                # Extract JSON from response
+                json_match = _JSON_OBJECT_RE.search(response)
+                if not json_match:
+                    raise ValueError("No JSON found in response")
+                    
+                data = json_loads(json_match.group())
             
             # Extract analysis and marked_text
             analysis = data.get("analysis", {})
@@ -390,27 +549,24 @@ class QuestionBoundaryDetector:
                     original_text, answered_questions, "content_not_preserved"
                 )
             
-            # Build results
-            detected_questions = list(set(
-                m["question_number"] for m in valid_markers
-            ))
-            detected_sub_questions = [
-                f"{m['question_number']}.{m['sub_question_id']}"
-                for m in valid_markers
-                if m.get("sub_question_id")
-            ]
-            
-            # Build confidence scores
+            # Build results and confidence scores in one pass
+            detected_questions = set()
+            detected_sub_questions = []
             confidence_scores = {}
             for m in valid_markers:
                 q_num = m["question_number"]
                 sub_id = m.get("sub_question_id")
-                key = f"{q_num}.{sub_id}" if sub_id else str(q_num)
+                detected_questions.add(q_num)
+                if sub_id:
+                    key = f"{q_num}.{sub_id}"
+                    detected_sub_questions.append(key)
+                else:
+                    key = str(q_num)
                 confidence_scores[key] = m.get("confidence", 0.9)
             
             return BoundaryDetectionResult(
                 marked_text=marked_text,
-                detected_questions=detected_questions,
+                detected_questions=list(detected_questions),
                 detected_sub_questions=detected_sub_questions,
                 confidence_scores=confidence_scores,
                 reasoning=reasoning,
@@ -433,6 +589,9 @@ class QuestionBoundaryDetector:
         """Remove markers below confidence threshold or with invalid question/sub-question IDs."""
         
         valid_markers = []
+        rejected_tags = []
+        answered_set = set(answered_questions)
+        sub_sets = {q: set(subs) for q, subs in sub_questions.items()}
         
         for marker in markers_found:
             q_num = marker.get("question_number")
@@ -441,54 +600,71 @@ class QuestionBoundaryDetector:
             
             # Check: confidence above threshold
             if confidence < CONFIDENCE_THRESHOLD:
-                self._remove_marker_from_text(marked_text, q_num, sub_id)
+                rejected_tags.append(self._marker_tag(q_num, sub_id))
                 logger.debug(f"Removed low-confidence marker Q{q_num}.{sub_id} (conf={confidence})")
                 continue
             
             # Check: question number in answered_questions
-            if q_num not in answered_questions:
-                marked_text = self._remove_marker_from_text(marked_text, q_num, sub_id)
+            if q_num not in answered_set:
+                rejected_tags.append(self._marker_tag(q_num, sub_id))
                 logger.debug(f"Removed invalid question marker Q{q_num}")
                 continue
             
             # Check: sub-question ID is valid (if provided)
             if sub_id:
-                valid_subs = sub_questions.get(str(q_num), [])
+                valid_subs = sub_sets.get(str(q_num))
                 if valid_subs and sub_id not in valid_subs:
-                    marked_text = self._remove_marker_from_text(marked_text, q_num, sub_id)
+                    rejected_tags.append(self._marker_tag(q_num, sub_id))
                     logger.debug(f"Removed invalid sub-question marker Q{q_num}.{sub_id}")
                     continue
             
             valid_markers.append(marker)
         
+        if rejected_tags:
+            marked_text = self._remove_markers_from_text(marked_text, rejected_tags)
+        
         return marked_text, valid_markers
     
-    def _remove_marker_from_text(
-        self, text: str, q_num: int, sub_id: Optional[str]
-    ) -> str:
-        """Remove a specific marker from text."""
+    @staticmethod
+    def _marker_tag(q_num: int, sub_id: Optional[str]) -> str:
+        """The <Q#> / <Q#.S> tag for a marker."""
         if sub_id:
-            tag = f"<Q{q_num}.{sub_id}>"
-        else:
-            tag = f"<Q{q_num}>"
-        return text.replace(tag, "", 1)
+            return f"<Q{q_num}.{sub_id}>"
+        return f"<Q{q_num}>"
+    
+    def _remove_markers_from_text(self, text: str, tags: List[str]) -> str:
+        """
+        Remove the first occurrence of each tag in tags (a tag listed twice
+        loses two occurrences), in one pass over the text.
+        """
+        remaining = Counter(tags)
+        
+        def drop(match: "re.Match[str]") -> str:
+            tag = match.group(0)
+            if remaining[tag] > 0:
+                remaining[tag] -= 1
+                return ""
+            return tag
+        
+        return QUESTION_MARKER_RE.sub(drop, text)
     
     def _validate_content_preserved(self, marked_text: str, original_text: str) -> bool:
         """Verify that marked text contains the same content as original (minus markers)."""
         
         # Remove all markers (both question and sub-question)
-        text_without_markers = re.sub(r'<Q\d+(?:\.[^>]+)?>', '', marked_text)
+        text_without_markers = QUESTION_MARKER_RE.sub('', marked_text)
         
-        # Normalize whitespace for comparison
-        normalized_marked = ' '.join(text_without_markers.split())
-        normalized_original = ' '.join(original_text.split())
+        # Lengths with whitespace normalized (only lengths are compared, so
+        # the normalized strings themselves are never built)
+        marked_length = _normalized_length(text_without_markers)
+        original_length = _normalized_length(original_text)
         
         # Allow small differences (within 5% of length)
-        if len(normalized_original) == 0:
-            return len(normalized_marked) == 0
+        if original_length == 0:
+            return marked_length == 0
             
         similarity_threshold = 0.95
-        length_ratio = min(len(normalized_marked), len(normalized_original)) / max(len(normalized_marked), len(normalized_original))
+        length_ratio = min(marked_length, original_length) / max(marked_length, original_length)
         
         return length_ratio >= similarity_threshold
     
@@ -521,10 +697,109 @@ class QuestionBoundaryDetector:
         )
 
 
+# =============================================================================
+# Cross-Request Micro-Batching
+# =============================================================================
+
+class BoundaryBatcher(MicroBatcher[_BoundaryRequest, Optional[Dict[str, Any]]]):
+    """
+    Shared micro-batcher for boundary detection VLM calls.
+    
+    Detectors submit single pages; batches of up to `max_batch_size` pages,
+    collected for at most `max_wait` seconds after the first (see
+    MicroBatcher), go out as one multi-image call (a batch of one uses the
+    regular single-page prompt). Each caller gets back its own page's entry
+    from the reply, or None if the model left that page out.
+    
+    The reply echoes every page's marked text, so the default batch stays
+    within one call's output cap (4 x 4000 tokens), and detectors using a
+    batcher wait BOUNDARY_BATCH_TIMEOUT instead of the per-page timeout.
+    """
+    
+    def __init__(self, vlm_provider, max_batch_size: int = 4, max_wait: float = 0.1):
+        super().__init__(max_batch_size, max_wait)
+        self.vlm_provider = vlm_provider
+    
+    async def submit(
+        self,
+        page_image_b64: str,
+        page_number: int,
+        answered_questions: List[int],
+        answered_context: str,
+        verified_text: str,
+    ) -> Optional[Dict[str, Any]]:
+        """Queue one page and wait for its entry in the reply (None if missing)."""
+        return await self._submit(_BoundaryRequest(
+            page_image_b64, page_number, answered_questions, answered_context, verified_text
+        ))
+    
+    async def _run_batch(self, batch: List[_BoundaryRequest]) -> List[Optional[Dict[str, Any]]]:
+        if len(batch) == 1:
+            request = batch[0]
+            user_prompt = BOUNDARY_DETECTION_PROMPT.format(
+                page_number=request.page_number,
+                answered_questions=request.answered_questions,
+                answered_context=request.answered_context,
+                transcribed_text=request.verified_text,
+            )
+        else:
+            user_prompt = BOUNDARY_BATCH_PROMPT.format(
+                image_count=len(batch),
+                page_blocks="\n\n".join(
+                    BOUNDARY_BATCH_PAGE_BLOCK.format(
+                        image_index=idx,
+                        page_number=request.page_number,
+                        answered_context=request.answered_context,
+                        answered_questions=request.answered_questions,
+                        transcribed_text=request.verified_text,
+                    )
+                    for idx, request in enumerate(batch, start=1)
+                ),
+            )
+        logger.info(f"Dispatching {len(batch)} queued page(s) for boundary detection")
+        
+        response = await self.vlm_provider.transcribe_images_async(
+            images_b64=[request.page_image_b64 for request in batch],
+            system_prompt=BOUNDARY_DETECTION_SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+            max_tokens=min(4000 * len(batch), MAX_BATCH_TOKENS),
+            temperature=0.0,
+        )
+        
+        json_match = _JSON_OBJECT_RE.search(response)
+        if not json_match:
+            return [None] * len(batch)
+        data = json_loads(json_match.group())
+        if len(batch) == 1:
+            return [data if isinstance(data, dict) else None]
+        return results_by_image_index(data.get("pages", []) if isinstance(data, dict) else [], len(batch))
+
+
 # =============================================================================
 # Helper Functions
 # =============================================================================
 
+@lru_cache(maxsize=128)
+def _answered_context(answered: Tuple[Tuple[int, Tuple[str, ...]], ...]) -> str:
+    """
+    Answered-questions context for the prompt, from (question, sub-question
+    ids) pairs. Memoized: pages of one exam repeat the same few combinations.
+    """
+    parts = []
+    for q, subs in answered:
+        if subs:
+            parts.append(f"שאלה {q} (סעיפים: {', '.join(subs)})")
+        else:
+            parts.append(f"שאלה {q}")
+    return ", ".join(parts) if parts else "all questions"
+
+
+def _normalized_length(text: str) -> int:
+    """len(' '.join(text.split())), without building the joined string."""
+    tokens = text.split()
+    return sum(map(len, tokens)) + max(len(tokens) - 1, 0)
+
+
 def parse_question_markers(text: str) -> Tuple[List[int], List[str], str]:
     """
     Parse <Q#> and <Q#.S> markers from text.
@@ -532,17 +807,41 @@ def parse_question_markers(text: str) -> Tuple[List[int], List[str], str]:
     Returns:
         Tuple of (detected question numbers, detected sub-questions, clean text)
     """
-    # Find all question markers
-    q_markers = re.findall(r'<Q(\d+)>', text)
-    questions = [int(m) for m in q_markers]
-    
-    # Find all sub-question markers
-    sq_markers = re.findall(r'<Q(\d+\.[^>]+)>', text)
+    questions = set()
+    sq_markers = []
+    for marker in QUESTION_MARKER_RE.finditer(text):
+        q_num, sub_id = marker.groups()
+        if sub_id is None:
+            questions.add(int(q_num))
+        else:
+            sq_markers.append(f"{q_num}.{sub_id}")
     
     # Clean text
-    clean_text = re.sub(r'<Q\d+(?:\.[^>]+)?>', '', text)
+    clean_text = QUESTION_MARKER_RE.sub('', text)
+    
+    return list(questions), sq_markers, clean_text
+
+
+def iter_marker_segments(text: str) -> Iterator[Tuple[str, str]]:
+    """
+    Scan text once, yielding (key, segment) for each <Q#>/<Q#.S> marker.
     
-    return list(set(questions)), sq_markers, clean_text
+    key is "2" or "2.א"; segment is the text after the marker up to the next
+    one (a slice of text, never copied piecewise). Text before the first
+    marker belongs to no question and is skipped.
+    """
+    current_key: Optional[str] = None
+    segment_start = 0
+    for marker in QUESTION_MARKER_RE.finditer(text):
+        if current_key is not None:
+            yield current_key, text[segment_start:marker.start()]
+        
+        q_num, sub_id = marker.groups()
+        current_key = f"{q_num}.{sub_id}" if sub_id is not None else q_num
+        segment_start = marker.end()
+    
+    if current_key is not None:
+        yield current_key, text[segment_start:]
 
 
 def extract_question_segments(text: str) -> Dict[str, str]:
@@ -552,37 +851,12 @@ def extract_question_segments(text: str) -> Dict[str, str]:
     Given: "<Q2><Q2.א>class A {...}<Q2.ב>class B {...}"
     Returns: {"2": "class A {...}", "2.א": "class A {...}", "2.ב": "class B {...}"}
     """
-    segments: Dict[str, str] = {}
-    
-    # Split by markers, keeping the markers
-    parts = re.split(r'(<Q\d+(?:\.[^>]+)?>)', text)
-    
-    current_keys: List[str] = []
-    current_text = ""
-    
-    for part in parts:
-        marker_match = re.match(r'<Q(\d+(?:\.[^>]+)?)>', part)
-        if marker_match:
-            # Save text to all current keys
-            for key in current_keys:
-                if key in segments:
-                    segments[key] += current_text
-                else:
-                    segments[key] = current_text
-            
-            # Start new segment
-            key = marker_match.group(1)
-            current_keys = [key]
-            current_text = ""
-        else:
-            current_text += part
-    
-    # Save final segment
-    for key in current_keys:
-        if key in segments:
-            segments[key] += current_text
-        else:
-            segments[key] = current_text
+    # Repeated markers append to their key's text: collect the pieces and
+    # join each key once, instead of re-copying the text on every append
+    chunks: Dict[str, List[str]] = {}
+    for key, segment in iter_marker_segments(text):
+        chunks.setdefault(key, []).append(segment)
     
     # Strip whitespace from all segments
-    return {k: v.strip() for k, v in segments.items() if v.strip()}
+    segments = {k: ''.join(pieces).strip() for k, pieces in chunks.items()}
+    return {k: v for k, v in segments.items() if v}
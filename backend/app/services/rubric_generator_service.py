@@ -10,11 +10,19 @@ Uses streaming for real-time feedback during question detection.
 """
 import logging
 import json
+import hashlib
 import re
+import sqlite3
+import threading
+import time
 import asyncio
-from typing import List, Dict, Any, Optional, AsyncGenerator
+import contextlib
+from typing import List, Dict, Any, Optional, AsyncGenerator, Tuple
 from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
 
+import openai
 from pydantic import BaseModel, Field
 from app.tracing import trace_if_enabled
 
@@ -23,9 +31,10 @@ from .rubric_service import (
     enhance_criterion_with_rules,
     validate_and_fix_enhanced_criterion,
     _extract_json_from_response,
-    get_openai_client,
     get_language_prompt_context,
 )
+from .document_parser import get_async_openai_client
+from .json_utils import json_dumps, json_loads
 from ..schemas.grading import (
     ExtractedQuestion,
     ExtractedSubQuestion,
@@ -53,7 +62,7 @@ class DetectedQuestion(BaseModel):
     teacher_points: Optional[float] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class DetectionEvent:
     """Event emitted during question detection stream."""
     type: str  # "progress", "question", "complete", "error"
@@ -168,20 +177,20 @@ async def detect_questions_from_pdf(
     
     logger.info(f"Extracted {len(pdf_text)} chars from PDF for question detection")
     
+    # Built once; retries resend the same (possibly large) request
+    messages = [
+        {"role": "system", "content": QUESTION_DETECTION_PROMPT},
+        {"role": "user", "content": f"טקסט המבחן:\n\n{pdf_text}\n\nהחזר JSON בלבד."}
+    ]
+    client = get_async_openai_client()
     last_error = None
     
     for attempt in range(max_retries):
         try:
-            client = get_openai_client()
-            
             response = await asyncio.wait_for(
-                asyncio.to_thread(
-                    client.chat.completions.create,
+                client.chat.completions.create(
                     model=settings.rubric_generation_model,
-                    messages=[
-                        {"role": "system", "content": QUESTION_DETECTION_PROMPT},
-                        {"role": "user", "content": f"טקסט המבחן:\n\n{pdf_text}\n\nהחזר JSON בלבד."}
-                    ],
+                    messages=messages,
                     response_format={"type": "json_object"},
                     max_tokens=8000,
                     temperature=0.1,
@@ -291,8 +300,6 @@ async def detect_questions_stream(
                 data=question.dict(),
                 event_id=event_id,
             )
-            # Small delay between questions for UI effect
-            await asyncio.sleep(0.1)
         
         # Complete
         event_id += 1
@@ -319,6 +326,150 @@ async def detect_questions_stream(
 # Criteria Generation
 # =============================================================================
 
+class _RateLimiter:
+    """
+    Request + token buckets that pace OpenAI calls before the API rejects them.
+    
+    Each bucket holds up to one minute's allowance and refills continuously;
+    acquire() waits until both have room for the call. After a 429, pause()
+    holds every caller until the server's Retry-After has passed, so retries
+    queue behind it instead of storming.
+    """
+    
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+    
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_capacity / 60)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_capacity / 60)
+    
+    async def acquire(self, tokens: int) -> None:
+        """Wait for one request slot and `tokens` tokens (capped at the bucket size)."""
+        tokens = min(float(tokens), self.token_capacity)
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._paused_until - now
+            if wait <= 0:
+                wait = max(
+                    (1 - self._requests) * 60 / self.request_capacity,
+                    (tokens - self._tokens) * 60 / self.token_capacity,
+                )
+            if wait <= 0:
+                self._requests -= 1
+                self._tokens -= tokens
+                return
+            await asyncio.sleep(wait)
+    
+    def pause(self, seconds: float) -> None:
+        """Hold all acquires for `seconds` (e.g. a 429's Retry-After)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_rate_limiter = _RateLimiter(settings.rubric_openai_rpm, settings.rubric_openai_tpm)
+
+
+class _RubricCache:
+    """
+    Content-addressed on-disk cache of criteria replies.
+    
+    Teachers re-run generation over the same question banks, so replies are
+    stored in a small SQLite file keyed by sha256 of the full chat request
+    (model, sampling settings and the rendered prompts, so a prompt change
+    never serves stale replies), expire after `ttl_seconds`, and are evicted
+    least-recently-used past `max_entries`. Only replies that parsed into a
+    question are stored; a hit is re-parsed against the current question, so
+    its pages are the caller's. get() and put() block on SQLite; call them
+    from a worker thread.
+    """
+    
+    def __init__(self, cache_dir: str, ttl_seconds: float, max_entries: int = 5000):
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        
+        cache_path = Path(cache_dir)
+        cache_path.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(cache_path / "rubric_criteria.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS criteria ("
+            " key TEXT PRIMARY KEY,"
+            " content TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.commit()
+    
+    @staticmethod
+    def key(body: Dict[str, Any]) -> str:
+        canonical = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content FROM criteria WHERE key = ? AND created_at > ?",
+                (key, now - self._ttl),
+            ).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE criteria SET accessed_at = ? WHERE key = ?", (now, key))
+                self._db.commit()
+        return row[0] if row else None
+    
+    def put(self, key: str, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO criteria (key, content, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            )
+            self._db.execute(
+                "DELETE FROM criteria WHERE created_at <= ? OR key IN ("
+                " SELECT key FROM criteria ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (now - self._ttl, self._max_entries),
+            )
+            self._db.commit()
+
+
+@lru_cache(maxsize=1)
+def _get_rubric_cache() -> Optional[_RubricCache]:
+    """The process-wide criteria cache, or None when disabled or unusable."""
+    if not settings.rubric_cache_dir:
+        return None
+    try:
+        return _RubricCache(settings.rubric_cache_dir, settings.rubric_cache_ttl_days * 86400)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Rubric cache disabled: {e}")
+        return None
+
+
+def _estimate_request_tokens(body: Dict[str, Any]) -> int:
+    """Rough token cost of a chat request (~4 chars/token plus the completion budget)."""
+    prompt_chars = sum(len(m["content"]) for m in body["messages"])
+    return prompt_chars // 4 + body.get("max_tokens", 0)
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Retry-After from a rate-limit error's response headers, if present."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
 RUBRIC_GENERATION_PROMPT = """<role>
 אתה פרופסור ומומחה עולמי להוראת מדעי המחשב עם 25 שנות ניסיון ביצירת מחוונים.
 התמחותך היא ביצירת קריטריונים מדויקים וכללי הורדת נקודות ספציפיים.
@@ -403,6 +554,19 @@ RUBRIC_GENERATION_PROMPT = """<role>
 </examples>"""
 
 
+# RUBRIC_GENERATION_PROMPT split at its {total_points} placeholders and
+# unescaped once, so each question only joins the points into it
+_RUBRIC_PROMPT_PARTS = [
+    part.replace("{{", "{").replace("}}", "}")
+    for part in RUBRIC_GENERATION_PROMPT.split("{total_points}")
+]
+
+
+def _rubric_generation_prompt(total_points: float) -> str:
+    """RUBRIC_GENERATION_PROMPT.format(total_points=total_points), from the precomputed parts."""
+    return str(total_points).join(_RUBRIC_PROMPT_PARTS)
+
+
 @trace_if_enabled(
     "rubric_generator_service_generate_criteria_for_question_trace",
     name="generate_criteria_for_question",
@@ -413,16 +577,28 @@ async def generate_criteria_for_question(
     subject_context: Optional[str] = None,
     programming_language: Optional[str] = None,
     max_retries: int = 3,
+    use_cache: bool = True,
+    sub_question_id: Optional[str] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
 ) -> ExtractedQuestion:
     """
     Generate criteria + reduction rules for a single question.
     
+    A question with sub-questions gets one concurrent call per sub-question,
+    each for its share of the points.
+    
     Args:
         question: The detected question with text
         total_points: Total points for this question
         subject_context: Optional subject description
         programming_language: Optional programming language for context
         max_retries: Number of retry attempts
+        use_cache: Reuse a cached reply for identical input (a fresh reply
+            is cached either way)
+        sub_question_id: Generate only this sub-question's criteria, returned
+            as the question's direct criteria
+        semaphore: Optional limit on LLM calls in flight, held around each
+            call (shared by the sub-question calls)
         
     Returns:
         ExtractedQuestion with generated criteria
@@ -431,11 +607,215 @@ async def generate_criteria_for_question(
         logger.warning(f"Empty question text for question {question.question_number}")
         return _create_fallback_question(question, total_points)
     
-    prompt = RUBRIC_GENERATION_PROMPT.format(total_points=total_points)
+    if question.sub_questions and sub_question_id is None:
+        return await _generate_sub_question_criteria(
+            question, total_points, subject_context, programming_language, max_retries, use_cache, semaphore
+        )
+    
+    messages = _build_criteria_messages(
+        question, total_points, subject_context, programming_language, sub_question_id
+    )
+    body = _criteria_request_body(messages)
+    
+    cache = _get_rubric_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key(body)
+        cached = await asyncio.to_thread(cache.get, cache_key) if use_cache else None
+        if cached is not None:
+            extracted = _question_from_criteria_response(question, cached, total_points, sub_question_id)
+            if extracted is not None:
+                logger.info(f"Rubric cache hit for Q{question.question_number}")
+                return extracted
+    
+    estimated_tokens = _estimate_request_tokens(body)
+    client = get_async_openai_client()
+    last_error = None
+    
+    for attempt in range(max_retries):
+        try:
+            async with semaphore or contextlib.nullcontext():
+                await _rate_limiter.acquire(estimated_tokens)
+                content = await asyncio.wait_for(
+                    _stream_json_completion(client, body),
+                    timeout=settings.rubric_llm_timeout_seconds,
+                )
+            if not content:
+                logger.warning(f"Empty response for Q{question.question_number} attempt {attempt + 1}")
+                continue
+            
+            extracted = _question_from_criteria_response(question, content, total_points, sub_question_id)
+            if extracted is None:
+                logger.warning(f"Invalid response format for Q{question.question_number}")
+                continue
+            if cache_key is not None:
+                await asyncio.to_thread(cache.put, cache_key, content)
+            return extracted
+            
+        except Exception as e:
+            last_error = e
+            logger.warning(f"Criteria generation for Q{question.question_number} attempt {attempt + 1} failed: {e}")
+            if attempt < max_retries - 1:
+                retry_after = _retry_after_seconds(e) if isinstance(e, openai.RateLimitError) else None
+                if retry_after is not None:
+                    # The next acquire() waits it out, along with everyone else's
+                    _rate_limiter.pause(retry_after)
+                else:
+                    await asyncio.sleep(0.5 * (attempt + 1))
+    
+    logger.error(f"Criteria generation failed for Q{question.question_number}: {last_error}")
+    return _create_fallback_question(question, total_points)
+
+
+def _split_points(total_points: float, parts: int) -> List[float]:
+    """Even split of total_points into `parts` shares that add back up to it."""
+    share = round(total_points / parts, 2)
+    return [share] * (parts - 1) + [round(total_points - share * (parts - 1), 2)]
+
+
+async def _generate_sub_question_criteria(
+    question: DetectedQuestion,
+    total_points: float,
+    subject_context: Optional[str],
+    programming_language: Optional[str],
+    max_retries: int,
+    use_cache: bool,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> ExtractedQuestion:
+    """Generate each sub-question's criteria in parallel and assemble the question."""
+    shares = _split_points(total_points, len(question.sub_questions))
+    results = await asyncio.gather(*(
+        generate_criteria_for_question(
+            question,
+            points,
+            subject_context=subject_context,
+            programming_language=programming_language,
+            max_retries=max_retries,
+            use_cache=use_cache,
+            sub_question_id=sub_id,
+            semaphore=semaphore,
+        )
+        for sub_id, points in zip(question.sub_questions, shares)
+    ))
+    return _assemble_sub_questions(question, results)
+
+
+def _assemble_sub_questions(
+    question: DetectedQuestion,
+    results: List[ExtractedQuestion],
+) -> ExtractedQuestion:
+    """Build the question from one generated result per sub-question, in order."""
+    sub_questions = [
+        ExtractedSubQuestion(
+            sub_question_id=sub_id,
+            sub_question_text=None,
+            criteria=result.criteria,
+            total_points=result.total_points,
+            source_pages=question.page_indexes,
+            extraction_status=result.extraction_status,
+            extraction_error=result.extraction_error,
+        )
+        for sub_id, result in zip(question.sub_questions, results)
+    ]
+    
+    return ExtractedQuestion(
+        question_number=question.question_number,
+        question_text=question.question_text,
+        total_points=sum(sq.total_points for sq in sub_questions),
+        criteria=[],  # No direct criteria when using sub-questions
+        sub_questions=sub_questions,
+        source_pages=question.page_indexes,
+        extraction_status=(
+            "success" if all(sq.extraction_status == "success" for sq in sub_questions) else "partial"
+        ),
+    )
+
+
+class _JsonObjectScanner:
+    """
+    Push-based watcher for the end of a streamed JSON reply.
+    
+    feed() takes the next text chunk and returns True once the first
+    top-level object has closed; `end` is then its end offset in the text
+    fed so far. Braces inside strings (code in criteria descriptions) are
+    skipped by tracking string/escape state.
+    """
+    
+    def __init__(self):
+        self.end: Optional[int] = None
+        self._offset = 0
+        self._depth = 0
+        self._in_string = self._escaped = False
+    
+    def feed(self, chunk: str) -> bool:
+        depth, in_string, escaped = self._depth, self._in_string, self._escaped
+        for i, ch in enumerate(chunk):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = depth > 0
+            elif ch == '{':
+                depth += 1
+            elif ch == '}' and depth > 0:
+                depth -= 1
+                if depth == 0:
+                    self.end = self._offset + i + 1
+                    return True
+        self._depth, self._in_string, self._escaped = depth, in_string, escaped
+        self._offset += len(chunk)
+        return False
+
+
+async def _stream_json_completion(client, body: Dict[str, Any]) -> Optional[str]:
+    """
+    Stream a chat completion and stop reading once its JSON object closes.
+    
+    Anything the model would send after the closing brace (trailing notes,
+    whitespace) is never waited for: the stream is closed right away. If the
+    object never closes, the whole reply is returned for the usual parsing.
+    """
+    scanner = _JsonObjectScanner()
+    parts: List[str] = []
+    stream = await client.chat.completions.create(**body, stream=True)
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                if scanner.feed(delta):
+                    break
+    finally:
+        await stream.close()
+    
+    text = "".join(parts)
+    return text[:scanner.end] if scanner.end is not None else text
+
+
+def _build_criteria_messages(
+    question: DetectedQuestion,
+    total_points: float,
+    subject_context: Optional[str] = None,
+    programming_language: Optional[str] = None,
+    sub_question_id: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    """Chat messages asking for one question's (or one sub-question's) criteria."""
+    prompt = _rubric_generation_prompt(total_points)
     
     # Format sub-questions info if present
     sub_q_info = ""
-    if question.sub_questions:
+    if sub_question_id is not None:
+        sub_q_info = (
+            f"\nתת-שאלות: {', '.join(question.sub_questions)}"
+            f"\nצור קריטריונים לתת-שאלה {sub_question_id} בלבד"
+        )
+    elif question.sub_questions:
         sub_q_info = f"\nתת-שאלות: {', '.join(question.sub_questions)}"
     
     # Add subject context if provided
@@ -454,87 +834,76 @@ async def generate_criteria_for_question(
 
 החזר JSON בלבד."""
     
-    last_error = None
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+
+def _criteria_request_body(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """chat.completions request for criteria generation (live or Batch API)."""
+    return {
+        "model": settings.rubric_generation_model,
+        "messages": messages,
+        "response_format": {"type": "json_object"},
+        "max_tokens": 4000,
+        "temperature": 0.15,
+    }
+
+
+def _question_from_criteria_response(
+    question: DetectedQuestion,
+    content: str,
+    total_points: float,
+    sub_question_id: Optional[str] = None,
+) -> Optional[ExtractedQuestion]:
+    """Build the ExtractedQuestion from a criteria reply; None if the reply is unusable."""
+    data = _extract_json_from_response(content)
+    if not data or "criteria" not in data:
+        return None
     
-    for attempt in range(max_retries):
-        try:
-            client = get_openai_client()
-            
-            response = await asyncio.wait_for(
-                asyncio.to_thread(
-                    client.chat.completions.create,
-                    model=settings.rubric_generation_model,
-                    messages=[
-                        {"role": "system", "content": prompt},
-                        {"role": "user", "content": user_content}
-                    ],
-                    response_format={"type": "json_object"},
-                    max_tokens=4000,
-                    temperature=0.15,
-                ),
-                timeout=settings.rubric_llm_timeout_seconds,
-            )
-            
-            content = response.choices[0].message.content
-            if not content:
-                logger.warning(f"Empty response for Q{question.question_number} attempt {attempt + 1}")
-                continue
-            
-            data = _extract_json_from_response(content)
-            if not data or "criteria" not in data:
-                logger.warning(f"Invalid response format for Q{question.question_number}")
-                continue
-            
-            # Build enhanced criteria
-            enhanced_criteria = []
-            for c in data.get("criteria", []):
-                criterion_dict = {
-                    "criterion_description": c.get("criterion_description", ""),
-                    "total_points": c.get("total_points", 0),
-                    "reduction_rules": c.get("reduction_rules", []),
-                    "notes": None,
-                    "raw_text": None,
-                    "extraction_confidence": "high",
-                }
-                # Validate and fix
-                fixed = validate_and_fix_enhanced_criterion(criterion_dict)
-                
-                enhanced_criteria.append(EnhancedCriterion(
-                    criterion_description=fixed["criterion_description"],
-                    total_points=fixed["total_points"],
-                    reduction_rules=[ReductionRule(**r) for r in fixed["reduction_rules"]],
-                    notes=fixed.get("notes"),
-                    raw_text=fixed.get("raw_text"),
-                    extraction_confidence=fixed.get("extraction_confidence", "high"),
-                ))
-            
-            # Handle sub-questions
-            if question.sub_questions:
-                # Distribute criteria among sub-questions
-                return _distribute_criteria_to_subquestions(
-                    question, enhanced_criteria, total_points
-                )
-            
-            actual_total = sum(c.total_points for c in enhanced_criteria)
-            
-            return ExtractedQuestion(
-                question_number=question.question_number,
-                question_text=question.question_text,
-                total_points=actual_total,
-                criteria=enhanced_criteria,
-                sub_questions=[],
-                source_pages=question.page_indexes,
-                extraction_status="success",
-            )
-            
-        except Exception as e:
-            last_error = e
-            logger.warning(f"Criteria generation for Q{question.question_number} attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(0.5 * (attempt + 1))
+    # Build enhanced criteria
+    enhanced_criteria = []
+    for c in data.get("criteria", []):
+        criterion_dict = {
+            "criterion_description": c.get("criterion_description", ""),
+            "total_points": c.get("total_points", 0),
+            "reduction_rules": c.get("reduction_rules", []),
+            "notes": None,
+            "raw_text": None,
+            "extraction_confidence": "high",
+        }
+        # Validate and fix
+        fixed = validate_and_fix_enhanced_criterion(criterion_dict)
+        
+        enhanced_criteria.append(EnhancedCriterion(
+            criterion_description=fixed["criterion_description"],
+            total_points=fixed["total_points"],
+            reduction_rules=[ReductionRule(**r) for r in fixed["reduction_rules"]],
+            notes=fixed.get("notes"),
+            raw_text=fixed.get("raw_text"),
+            extraction_confidence=fixed.get("extraction_confidence", "high"),
+        ))
     
-    logger.error(f"Criteria generation failed for Q{question.question_number}: {last_error}")
-    return _create_fallback_question(question, total_points)
+    # A whole-question reply (Batch API) is split across the sub-questions;
+    # a single sub-question's reply stays as direct criteria
+    if question.sub_questions and sub_question_id is None:
+        # Distribute criteria among sub-questions
+        return _distribute_criteria_to_subquestions(
+            question, enhanced_criteria, total_points
+        )
+    
+    actual_total = sum(c.total_points for c in enhanced_criteria)
+    
+    return ExtractedQuestion(
+        question_number=question.question_number,
+        question_text=question.question_text,
+        total_points=actual_total,
+        criteria=enhanced_criteria,
+        sub_questions=[],
+        source_pages=question.page_indexes,
+        extraction_status="success",
+    )
 
 
 def _create_fallback_question(question: DetectedQuestion, total_points: float) -> ExtractedQuestion:
@@ -657,30 +1026,170 @@ async def generate_full_rubric(
     
     logger.info(f"Generating rubric with {len(questions)} questions")
     
-    # Generate all questions in parallel
-    tasks = [
-        generate_criteria_for_question(
-            question=q,
-            total_points=q.teacher_points or q.suggested_points or 10,
-            subject_context=rubric_description,
-            programming_language=programming_language,
+    # Generate questions in parallel, at most rubric_max_concurrency LLM calls
+    # (questions, or their sub-questions) in flight at a time
+    semaphore = asyncio.Semaphore(settings.rubric_max_concurrency)
+    
+    async def generate(q: DetectedQuestion) -> ExtractedQuestion:
+        points = q.teacher_points or q.suggested_points or 10
+        try:
+            return await generate_criteria_for_question(
+                question=q,
+                total_points=points,
+                subject_context=rubric_description,
+                programming_language=programming_language,
+                semaphore=semaphore,
+            )
+        except Exception as e:
+            logger.error(f"Failed to generate Q{q.question_number}: {e}")
+            return _create_fallback_question(q, points)
+    
+    # Each task returns its own fallback, so results line up with questions
+    extracted_questions = list(await asyncio.gather(*(generate(q) for q in questions)))
+    
+    response = LegacyExtractRubricResponse(
+        questions=extracted_questions,
+        name=rubric_name,
+        description=rubric_description,
+        programming_language=programming_language,
+    )
+    
+    logger.info(f"Generated rubric: {response.num_questions} questions, {response.num_criteria} criteria, {response.total_points} points")
+    
+    return response
+
+
+# Batch API jobs finish within the 24h completion window, usually much sooner
+RUBRIC_BATCH_POLL_SECONDS = 30.0
+_BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+async def generate_full_rubric_batch(
+    questions: List[DetectedQuestion],
+    rubric_name: Optional[str] = None,
+    rubric_description: Optional[str] = None,
+    programming_language: Optional[str] = None,
+    poll_seconds: float = RUBRIC_BATCH_POLL_SECONDS,
+) -> LegacyExtractRubricResponse:
+    """
+    Generate a complete rubric through the OpenAI Batch API.
+    
+    For offline/bulk rubric builds: all questions go out as one batch job
+    (about half the price of live calls, outside the live rate limits) and
+    the job is polled until it finishes, which can take minutes to hours.
+    Teacher-facing flows should keep using generate_full_rubric.
+    
+    Requests match generate_full_rubric's: one line per question, or per
+    sub-question with its share of the points. Lines missing from the batch
+    output (failed lines, unusable replies, or a job that did not complete)
+    are generated live instead, under the same concurrency limit.
+    
+    Args:
+        questions: List of detected questions with points set
+        rubric_name: Optional name for the rubric
+        rubric_description: Optional description
+        programming_language: Optional programming language for context
+        poll_seconds: Seconds between batch status checks
+        
+    Returns:
+        LegacyExtractRubricResponse ready for RubricEditor display
+    """
+    if not questions:
+        return await generate_full_rubric(
+            questions, rubric_name, rubric_description, programming_language
         )
-        for q in questions
+    
+    # (custom_id, question, points, sub_question_id) for each request, and
+    # each question's requests in order
+    requests: List[Tuple[str, DetectedQuestion, float, Optional[str]]] = []
+    question_requests: List[List[int]] = []
+    for i, q in enumerate(questions):
+        total = q.teacher_points or q.suggested_points or 10
+        first = len(requests)
+        if q.sub_questions and q.question_text:
+            shares = _split_points(total, len(q.sub_questions))
+            for j, (sub_id, share) in enumerate(zip(q.sub_questions, shares)):
+                requests.append((f"q{i}-s{j}", q, share, sub_id))
+        else:
+            requests.append((f"q{i}", q, total, None))
+        question_requests.append(list(range(first, len(requests))))
+    
+    lines = [
+        json_dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _criteria_request_body(_build_criteria_messages(
+                q, total, rubric_description, programming_language, sub_id
+            )),
+        })
+        for custom_id, q, total, sub_id in requests
     ]
     
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    extracted_questions = []
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            logger.error(f"Failed to generate Q{questions[i].question_number}: {result}")
-            # Use fallback
-            extracted_questions.append(_create_fallback_question(
-                questions[i],
-                questions[i].teacher_points or questions[i].suggested_points or 10,
-            ))
+    client = get_async_openai_client()
+    contents: Dict[str, str] = {}
+    try:
+        input_file = await client.files.create(
+            file=("rubric_batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info(f"Submitted rubric batch {batch.id} with {len(lines)} requests for {len(questions)} questions")
+        
+        while batch.status not in _BATCH_TERMINAL_STATUSES:
+            await asyncio.sleep(poll_seconds)
+            batch = await client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            logger.warning(f"Rubric batch {batch.id} ended as {batch.status}")
         else:
-            extracted_questions.append(result)
+            output = await client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json_loads(line)
+                body = (item.get("response") or {}).get("body") or {}
+                choices = body.get("choices") or []
+                if choices and choices[0].get("message", {}).get("content"):
+                    contents[item["custom_id"]] = choices[0]["message"]["content"]
+    except Exception as e:
+        logger.error(f"Rubric batch failed, generating live: {e}")
+    
+    semaphore = asyncio.Semaphore(settings.rubric_max_concurrency)
+    
+    async def collect(
+        custom_id: str,
+        question: DetectedQuestion,
+        total: float,
+        sub_id: Optional[str],
+    ) -> ExtractedQuestion:
+        content = contents.get(custom_id)
+        if content:
+            try:
+                extracted = _question_from_criteria_response(question, content, total, sub_id)
+                if extracted is not None:
+                    return extracted
+            except Exception as e:
+                logger.warning(f"Unusable batch reply for Q{question.question_number}: {e}")
+        return await generate_criteria_for_question(
+            question=question,
+            total_points=total,
+            subject_context=rubric_description,
+            programming_language=programming_language,
+            sub_question_id=sub_id,
+            semaphore=semaphore,
+        )
+    
+    results = await asyncio.gather(*(collect(*request) for request in requests))
+    extracted_questions = [
+        _assemble_sub_questions(q, [results[r] for r in indexes])
+        if requests[indexes[0]][3] is not None else results[indexes[0]]
+        for q, indexes in zip(questions, question_requests)
+    ]
     
     response = LegacyExtractRubricResponse(
         questions=extracted_questions,
@@ -689,7 +1198,7 @@ async def generate_full_rubric(
         programming_language=programming_language,
     )
     
-    logger.info(f"Generated rubric: {response.num_questions} questions, {response.num_criteria} criteria, {response.total_points} points")
+    logger.info(f"Generated rubric (batch): {len(contents)}/{len(lines)} requests from batch output")
     
     return response
 
@@ -700,6 +1209,7 @@ async def regenerate_single_question(
     sub_questions: List[str],
     total_points: float,
     programming_language: Optional[str] = None,
+    force: bool = True,
 ) -> ExtractedQuestion:
     """
     Regenerate criteria for a single question.
@@ -712,6 +1222,7 @@ async def regenerate_single_question(
         sub_questions: List of sub-question IDs
         total_points: Total points for the question
         programming_language: Optional programming language for context
+        force: Skip the criteria cache so "refresh" yields a new generation
         
     Returns:
         New ExtractedQuestion with regenerated criteria
@@ -726,4 +1237,5 @@ async def regenerate_single_question(
         detected, 
         total_points,
         programming_language=programming_language,
+        use_cache=not force,
     )
@@ -45,6 +45,13 @@ except ImportError:
     logger_temp = logging.getLogger(__name__)
     logger_temp.warning("python-bidi not installed, RTL text may appear reversed")
 
+# PDFium text extraction (C++; installed with pdfplumber)
+try:
+    import pypdfium2 as pdfium
+    HAS_PDFIUM = True
+except ImportError:
+    HAS_PDFIUM = False
+
 from ..models.grading import Rubric
 from ..schemas.grading import (
     QuestionPageMapping,
@@ -59,6 +66,7 @@ from ..schemas.grading import (
 )
 from .document_parser import pdf_to_images, image_to_base64, call_vision_llm, get_openai_client
 from .vlm_rubric_extractor import QUESTION_EXTRACTION_SYSTEM_PROMPT
+from .json_utils import json_loads
 
 logger = logging.getLogger(__name__)
 
@@ -798,7 +806,7 @@ def _extract_json_from_response(content: str) -> Optional[Dict]:
     
     # Try direct JSON parse first
     try:
-        return json.loads(content)
+        return json_loads(content)
     except json.JSONDecodeError:
         pass
     
@@ -806,7 +814,7 @@ def _extract_json_from_response(content: str) -> Optional[Dict]:
     json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', content)
     if json_match:
         try:
-            return json.loads(json_match.group(1))
+            return json_loads(json_match.group(1))
         except json.JSONDecodeError:
             pass
     
@@ -814,7 +822,7 @@ def _extract_json_from_response(content: str) -> Optional[Dict]:
     brace_match = re.search(r'\{[\s\S]*\}', content)
     if brace_match:
         try:
-            return json.loads(brace_match.group(0))
+            return json_loads(brace_match.group(0))
         except json.JSONDecodeError:
             pass
     
@@ -1326,12 +1334,38 @@ def _robust_json_parse(response: str, context: str = "") -> Dict[str, Any]:
 # PDF-Native Question Text Extraction (NEW)
 # =============================================================================
 
+def _extract_pdf_text_pdfium(pdf_bytes: bytes) -> List[str]:
+    """
+    Extract per-page text with PDFium.
+    
+    PDFium already returns RTL text in logical order, so unlike pdfplumber's
+    output it must not go through _normalize_rtl_text.
+    """
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    try:
+        pages_text = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            pages_text.append(textpage.get_text_range().replace("\r\n", "\n"))
+            textpage.close()
+            page.close()
+        return pages_text
+    finally:
+        pdf.close()
+
+
 def extract_full_pdf_text(pdf_bytes: bytes) -> str:
     """
-    Extract full text from PDF using pdfplumber with RTL normalization.
+    Extract full text from PDF using PDFium, falling back to pdfplumber with
+    RTL normalization.
     
     Returns all pages joined with page break markers for LLM context.
     """
+    if HAS_PDFIUM:
+        try:
+            return "\n\n---PAGE---\n\n".join(_extract_pdf_text_pdfium(pdf_bytes))
+        except Exception as e:
+            logger.warning(f"PDFium text extraction failed, using pdfplumber: {e}")
     try:
         with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
             pages_text = []
@@ -24,13 +24,51 @@ from ..models.transcription import Transcription
 from ..services.document_parser import pdf_to_images
 from ..services.gcs_service import get_gcs_service
 from ..services.handwriting_transcription_service import (
+    CachedVLMProvider,
     HandwritingTranscriptionService,
+    VLMBatchDispatcher,
     get_vlm_provider,
 )
 from ..services.transcription_adapter import build_transcription_draft
 
 logger = logging.getLogger(__name__)
 
+# Providers are reused across uploads: one set of SDK clients on the shared
+# keep-alive connection pool, and one handle on the VLM response cache.
+_providers: dict[tuple, object] = {}
+
+# One dispatcher per provider so concurrent uploads share VLM calls
+_dispatchers: dict[object, VLMBatchDispatcher] = {}
+
+
+def _get_provider():
+    key = (
+        settings.transcription_vlm_provider,
+        settings.transcription_vlm_model,
+        settings.transcription_vlm_cache_dir,
+    )
+    provider = _providers.get(key)
+    if provider is None:
+        provider = get_vlm_provider(
+            settings.transcription_vlm_provider,
+            **({"model": settings.transcription_vlm_model}
+               if settings.transcription_vlm_model else {}),
+        )
+        if settings.transcription_vlm_cache_dir:
+            provider = CachedVLMProvider(
+                provider, cache_dir=settings.transcription_vlm_cache_dir
+            )
+        _providers[key] = provider
+    return provider
+
+
+def _get_dispatcher(provider) -> VLMBatchDispatcher:
+    dispatcher = _dispatchers.get(provider)
+    if dispatcher is None:
+        dispatcher = VLMBatchDispatcher(provider)
+        _dispatchers[provider] = dispatcher
+    return dispatcher
+
 
 async def transcribe_one(
     pdf_bytes: bytes,
@@ -87,16 +125,20 @@ async def transcribe_one(
                 trust_run, page_count=page_count, duration_ms=duration_ms
             )
         else:
-            provider = get_vlm_provider(
-                settings.transcription_vlm_provider,
-                **({"model": settings.transcription_vlm_model}
-                   if settings.transcription_vlm_model else {}),
-            )
-            service = HandwritingTranscriptionService(vlm_provider=provider)
-
-            # VLM transcription — blocking, run in thread pool
-            result = await run_in_threadpool(
-                service.transcribe_pdf,
+            provider = _get_provider()
+            if settings.transcription_batch_dispatch:
+                service = HandwritingTranscriptionService(
+                    dispatcher=_get_dispatcher(provider),
+                    debug_dump=settings.transcription_debug_dump,
+                )
+            else:
+                service = HandwritingTranscriptionService(
+                    vlm_provider=provider,
+                    debug_dump=settings.transcription_debug_dump,
+                )
+
+            # VLM transcription — rasterization and VLM calls run off the loop
+            result = await service.transcribe_pdf_async(
                 pdf_bytes,
                 filename or "upload.pdf",
             )
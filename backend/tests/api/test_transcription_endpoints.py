@@ -9,7 +9,7 @@ load-bearing invariant guards.
 """
 import io
 import json
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
@@ -78,7 +78,7 @@ def _patch_transcription_infra(transcription_result=None):
     mock_svc_cls = stack.enter_context(
         patch("app.services.transcribe_one.HandwritingTranscriptionService")
     )
-    mock_svc_cls.return_value.transcribe_pdf.return_value = transcription_result
+    mock_svc_cls.return_value.transcribe_pdf_async = AsyncMock(return_value=transcription_result)
 
     stack.enter_context(
         patch("app.services.transcribe_one.get_vlm_provider", return_value=MagicMock())
@@ -253,7 +253,7 @@ def test_12_vlm_failure_returns_502(client, headers_a, rubric_a):
          patch("app.services.transcribe_one.pdf_to_images", return_value=[MagicMock()]), \
          patch("app.services.transcribe_one.get_gcs_service"):
 
-        MockSvc.return_value.transcribe_pdf.side_effect = RuntimeError("VLM exploded")
+        MockSvc.return_value.transcribe_pdf_async = AsyncMock(side_effect=RuntimeError("VLM exploded"))
 
         resp = client.post(
             "/api/v0/transcriptions/transcribe",
@@ -0,0 +1,39 @@
+"""
+Tests for pdf_preview_service.generate_pdf_previews.
+
+PDF rendering is patched out (poppler is not needed); pages are plain PIL
+images of distinct sizes so their order can be checked.
+"""
+
+import base64
+import io
+from unittest.mock import patch
+
+from PIL import Image
+
+from app.services import pdf_preview_service
+from app.services.pdf_preview_service import generate_pdf_previews
+
+
+def _pages(count):
+    return [Image.new("RGB", (400 + 10 * i, 600), "white") for i in range(count)]
+
+
+def test_previews_keep_page_order_and_rendered_size():
+    with patch.object(pdf_preview_service, "pdf_to_images", return_value=_pages(5)) as render:
+        result = generate_pdf_previews(b"%PDF", thumbnail_max_size=300)
+
+    # Rendered at thumbnail size rather than downscaled afterwards
+    assert render.call_args.kwargs["max_size"] == 300
+
+    assert result["page_count"] == 5
+    assert [p["page_number"] for p in result["pages"]] == [1, 2, 3, 4, 5]
+    assert [p["width"] for p in result["pages"]] == [400, 410, 420, 430, 440]
+    thumb = Image.open(io.BytesIO(base64.b64decode(result["pages"][0]["thumbnail_base64"])))
+    assert max(thumb.size) == 300
+    assert thumb.format == "JPEG"
+
+
+def test_empty_pdf_has_no_previews():
+    with patch.object(pdf_preview_service, "pdf_to_images", return_value=[]):
+        assert generate_pdf_previews(b"%PDF") == {"page_count": 0, "pages": []}
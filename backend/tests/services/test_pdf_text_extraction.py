@@ -0,0 +1,50 @@
+"""
+Tests for rubric_service.extract_full_pdf_text.
+
+PDFs are generated with reportlab. Hebrew lines are drawn in visual order,
+as most PDF generators emit them, and must come back in logical order.
+"""
+
+import io
+import os
+from unittest.mock import patch
+
+import pytest
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from app.services import rubric_service
+from app.services.rubric_service import extract_full_pdf_text
+
+_HEBREW_FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+_LOGICAL = "שאלה 2 (35 נקודות) כתוב פעולה"
+
+
+def _pdf(pages):
+    pdfmetrics.registerFont(TTFont("DejaVuSans", _HEBREW_FONT))
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    for line in pages:
+        c.setFont("DejaVuSans", 12)
+        c.drawString(100, 700, line)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+@pytest.mark.skipif(not os.path.exists(_HEBREW_FONT), reason="needs a Hebrew-capable font")
+@pytest.mark.parametrize("use_pdfium", [True, False])
+def test_hebrew_pages_extract_in_logical_order(use_pdfium):
+    from bidi.algorithm import get_display
+
+    pdf_bytes = _pdf([get_display(_LOGICAL), "int x = 5;"])
+
+    with patch.object(rubric_service, "HAS_PDFIUM", use_pdfium and rubric_service.HAS_PDFIUM):
+        text = extract_full_pdf_text(pdf_bytes)
+
+    assert text.split("\n\n---PAGE---\n\n") == [_LOGICAL, "int x = 5;"]
+
+
+def test_invalid_pdf_returns_empty_text():
+    assert extract_full_pdf_text(b"not a pdf") == ""
@@ -0,0 +1,206 @@
+"""
+Tests for question_boundary_detector marker parsing.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import patch
+
+from app.services import question_boundary_detector
+from app.services.question_boundary_detector import (
+    BoundaryBatcher,
+    QuestionBoundaryDetector,
+    extract_question_segments,
+    iter_marker_segments,
+    parse_question_markers,
+)
+
+
+class _MarkingProvider:
+    """Marks each page as Q1 and records how many calls overlap."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def transcribe_images(self, images_b64, system_prompt, user_prompt, **kwargs):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        text = images_b64[0]
+        return json.dumps({
+            "analysis": {"markers_found": [{"question_number": 1, "confidence": 0.95}]},
+            "marked_text": f"<Q1>{text}",
+        })
+
+    async def transcribe_images_async(self, **kwargs):
+        return await asyncio.to_thread(self.transcribe_images, **kwargs)
+
+
+class _BatchMarkingProvider:
+    """Answers multi-image calls in the batched format, skipping `skip` texts."""
+
+    def __init__(self, skip=()):
+        self.skip = set(skip)
+        self.calls = []
+        self.max_tokens = []
+
+    def transcribe_images(self, images_b64, system_prompt, user_prompt, max_tokens=None, **kwargs):
+        self.calls.append(list(images_b64))
+        self.max_tokens.append(max_tokens)
+        if len(images_b64) == 1:
+            return json.dumps({"analysis": {"markers_found": []}, "marked_text": images_b64[0]})
+        return json.dumps({"pages": [
+            {
+                "image_index": idx,
+                "analysis": {"markers_found": [{"question_number": 1, "confidence": 0.95}]},
+                "marked_text": f"<Q1>{text}",
+            }
+            for idx, text in enumerate(images_b64, start=1)
+            if text not in self.skip
+        ]})
+
+    async def transcribe_images_async(self, **kwargs):
+        return self.transcribe_images(**kwargs)
+
+
+def _page(n):
+    text = f"page {n} text"
+    return {
+        "page_image_b64": text,
+        "raw_text": text,
+        "verified_text": text,
+        "answered_questions": [1, 2],
+        "page_number": n,
+    }
+
+
+def test_parse_question_markers_splits_questions_and_sub_questions():
+    questions, sub_questions, clean = parse_question_markers(
+        "<Q2><Q2.א>class A {}<Q2.ב>class B {}<Q3>int x;<Q2>"
+    )
+
+    assert sorted(questions) == [2, 3]
+    assert sub_questions == ["2.א", "2.ב"]
+    assert clean == "class A {}class B {}int x;"
+
+
+def test_iter_marker_segments_yields_each_marker_once():
+    assert list(iter_marker_segments("pre<Q1>a<Q1.א>b<Q2>")) == [
+        ("1", "a"),
+        ("1.א", "b"),
+        ("2", ""),
+    ]
+    assert list(iter_marker_segments("no markers")) == []
+
+
+def test_extract_question_segments_groups_text_by_marker():
+    segments = extract_question_segments(
+        "preamble <Q2><Q2.א>class A {}\n<Q2.ב>class B {}\n<Q3> int x; <Q2.א>more"
+    )
+
+    # Text before the first marker belongs to no question; repeated markers append
+    assert segments == {
+        "2.א": "class A {}\nmore",
+        "2.ב": "class B {}",
+        "3": "int x;",
+    }
+
+
+async def test_detect_boundaries_batch_bounded_and_in_order():
+    provider = _MarkingProvider()
+    detector = QuestionBoundaryDetector(provider, max_concurrency=3)
+
+    pages = [_page(n) for n in range(1, 7)]
+    # Two overlapping batches share the detector's limit
+    first, second = await asyncio.gather(
+        detector.detect_boundaries_batch(pages[:3]),
+        detector.detect_boundaries_batch(pages[3:]),
+    )
+    results = first + second
+
+    assert [r.marked_text for r in results] == [f"<Q1>page {n} text" for n in range(1, 7)]
+    assert not any(r.used_fallback for r in results)
+    assert 1 < provider.max_in_flight <= 3
+
+
+async def test_slow_page_times_out_to_fallback():
+    detector = QuestionBoundaryDetector(_MarkingProvider(delay=0.3))
+
+    with patch.object(question_boundary_detector, "BOUNDARY_DETECTION_TIMEOUT", 0.05):
+        result = await detector.detect_boundaries(**_page(1))
+
+    assert result.used_fallback
+    assert result.reasoning == "Fallback used: timeout"
+    assert result.marked_text == "<Q1>page 1 text"
+
+
+def test_filter_markers_removes_rejected_tags():
+    detector = QuestionBoundaryDetector(None)
+    markers = [
+        {"question_number": 1, "confidence": 0.95},
+        {"question_number": 1, "sub_question_id": "א", "confidence": 0.5},  # low confidence
+        {"question_number": 3, "confidence": 0.95},  # not answered
+        {"question_number": 1, "sub_question_id": "ד", "confidence": 0.9},  # unknown sub-question
+    ]
+
+    text, valid = detector._filter_markers(
+        "<Q1><Q1.א>a<Q3>b<Q1.ד>c<Q1.א>d",
+        markers,
+        answered_questions=[1, 2],
+        sub_questions={"1": ["א", "ב"]},
+    )
+
+    # Each rejected marker drops one occurrence of its tag
+    assert text == "<Q1>abc<Q1.א>d"
+    assert valid == [markers[0]]
+
+
+async def test_detect_boundaries_batch_falls_back_for_a_bad_page():
+    detector = QuestionBoundaryDetector(_MarkingProvider(delay=0))
+    bad = {"verified_text": "x", "answered_questions": [2]}  # missing arguments
+
+    results = await detector.detect_boundaries_batch([_page(1), bad])
+
+    assert results[0].marked_text == "<Q1>page 1 text"
+    assert results[1].used_fallback and results[1].marked_text == "<Q2>x"
+
+
+async def test_batcher_groups_pages_across_callers():
+    provider = _BatchMarkingProvider(skip={"page 2 text"})
+    batcher = BoundaryBatcher(provider, max_batch_size=4, max_wait=0.05)
+    detectors = [QuestionBoundaryDetector(provider, batcher=batcher) for _ in range(2)]
+
+    first, second = await asyncio.gather(
+        detectors[0].detect_boundaries_batch([_page(1), _page(2)]),
+        detectors[1].detect_boundaries_batch([_page(3), _page(4)]),
+    )
+
+    # One call for all four pages; page 2 was left out and is retried alone
+    assert sorted(map(sorted, provider.calls)) == [
+        ["page 1 text", "page 2 text", "page 3 text", "page 4 text"],
+        ["page 2 text"],
+    ]
+    results = first + second
+    assert [r.marked_text for r in results] == [
+        "<Q1>page 1 text", "page 2 text", "<Q1>page 3 text", "<Q1>page 4 text"
+    ]
+
+
+async def test_batcher_caps_output_tokens_for_large_batches():
+    provider = _BatchMarkingProvider()
+    batcher = BoundaryBatcher(provider, max_batch_size=8, max_wait=0.05)
+    detector = QuestionBoundaryDetector(provider, batcher=batcher)
+
+    results = await detector.detect_boundaries_batch([_page(n) for n in range(1, 9)])
+
+    assert [len(call) for call in provider.calls] == [5, 3]  # detector concurrency is 5
+    assert provider.max_tokens == [16000, 12000]
+    assert all(r.marked_text.startswith("<Q1>") for r in results)
@@ -0,0 +1,305 @@
+"""
+Tests for rubric_generator_service criteria generation.
+
+The OpenAI client is replaced with an in-memory fake that answers both live
+chat.completions calls and Batch API jobs.
+"""
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.services import rubric_generator_service
+from app.services.rubric_generator_service import (
+    DetectedQuestion,
+    _JsonObjectScanner,
+    _RateLimiter,
+    _RubricCache,
+    generate_criteria_for_question,
+    generate_full_rubric,
+    generate_full_rubric_batch,
+    regenerate_single_question,
+)
+
+
+@pytest.fixture(autouse=True)
+def _no_rubric_cache():
+    # Tests opt into the on-disk cache explicitly
+    with patch.object(rubric_generator_service, "_get_rubric_cache", return_value=None):
+        yield
+
+
+def _criteria_reply(points):
+    return json.dumps({
+        "criteria": [{
+            "criterion_description": "לוגיקה נכונה",
+            "total_points": points,
+            "reduction_rules": [
+                {"description": "תנאי שגוי", "reduction_value": points, "is_explicit": False}
+            ],
+        }]
+    }, ensure_ascii=False)
+
+
+class _FakeStream:
+    """Async chunk stream that records how far it was read and whether it was closed."""
+
+    def __init__(self, text, size=7):
+        self.chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        self.read = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read == len(self.chunks):
+            raise StopAsyncIteration
+        self.read += 1
+        delta = SimpleNamespace(content=self.chunks[self.read - 1])
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeAsyncOpenAI:
+    """Answers every criteria request with one criterion worth the question's points."""
+
+    def __init__(self, batch_skip=(), trailer="", delay=0):
+        self.batch_skip = set(batch_skip)
+        self.trailer = trailer
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.streams = []
+        self.prompts = []
+        self.live_calls = 0
+        self.batch_lines = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.files = SimpleNamespace(create=self._upload, content=self._download)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    @staticmethod
+    def _points(body):
+        user = body["messages"][1]["content"]
+        return float(user.split('סה"כ נקודות: ')[1].split()[0])
+
+    async def _create(self, stream=False, **body):
+        assert stream
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        self.live_calls += 1
+        self.prompts.append(body["messages"][1]["content"])
+        self.streams.append(_FakeStream(_criteria_reply(self._points(body)) + self.trailer))
+        return self.streams[-1]
+
+    async def _upload(self, file, purpose):
+        assert purpose == "batch"
+        self.batch_lines = [json.loads(line) for line in file[1].decode("utf-8").splitlines()]
+        return SimpleNamespace(id="file-in")
+
+    async def _create_batch(self, input_file_id, endpoint, completion_window):
+        return SimpleNamespace(id="batch-1", status="validating", output_file_id=None)
+
+    async def _retrieve_batch(self, batch_id):
+        return SimpleNamespace(id=batch_id, status="completed", output_file_id="file-out")
+
+    async def _download(self, file_id):
+        out = []
+        for line in self.batch_lines:
+            if line["custom_id"] in self.batch_skip:
+                out.append({"custom_id": line["custom_id"], "response": None, "error": {"code": "x"}})
+                continue
+            body = {"choices": [{"message": {"content": _criteria_reply(self._points(line["body"]))}}]}
+            out.append({"custom_id": line["custom_id"], "response": {"status_code": 200, "body": body}})
+        return SimpleNamespace(text="\n".join(json.dumps(o, ensure_ascii=False) for o in out))
+
+
+def _questions():
+    return [
+        DetectedQuestion(question_number=1, question_text="כתוב פעולה", teacher_points=20),
+        DetectedQuestion(question_number=2, question_text="כתוב מחלקה", suggested_points=15),
+        DetectedQuestion(question_number=3, question_text="כתוב לולאה"),
+    ]
+
+
+async def test_generate_full_rubric_live():
+    client = _FakeAsyncOpenAI()
+    with patch.object(rubric_generator_service, "get_async_openai_client", return_value=client):
+        rubric = await generate_full_rubric(_questions())
+
+    assert client.live_calls == 3
+    assert [q.total_points for q in rubric.questions] == [20, 15, 10]
+
+
+async def test_generate_full_rubric_falls_back_for_failed_question():
+    client = _FakeAsyncOpenAI()
+    real = generate_criteria_for_question
+
+    async def flaky(question, **kwargs):
+        if question.question_number == 2:
+            raise RuntimeError("boom")
+        return await real(question, **kwargs)
+
+    with patch.object(rubric_generator_service, "get_async_openai_client", return_value=client), \
+            patch.object(rubric_generator_service, "generate_criteria_for_question", flaky):
+        rubric = await generate_full_rubric(_questions())
+
+    assert [q.question_number for q in rubric.questions] == [1, 2, 3]
+    assert [q.extraction_status for q in rubric.questions] == ["success", "partial", "success"]
+
+
+async def test_sub_questions_get_one_call_each_with_split_points():
+    client = _FakeAsyncOpenAI()
+    question = DetectedQuestion(question_number=2, question_text="כתוב מחלקה", sub_questions=["א", "ב", "ג"])
+
+    with patch.object(rubric_generator_service, "get_async_openai_client", return_value=client):
+        result = await generate_criteria_for_question(question, 10)
+
+    assert client.live_calls == 3
+    assert sorted(p.split("לתת-שאלה ")[1].split()[0] for p in client.prompts) == ["א", "ב", "ג"]
+    assert [(sq.sub_question_id, sq.total_points) for sq in result.sub_questions] == [
+        ("א", 3.33), ("ב", 3.33), ("ג", 3.34),
+    ]
+    assert result.criteria == [] and result.total_points == pytest.approx(10)
+    assert result.extraction_status == "success"
+
+
+async def test_concurrency_limit_counts_sub_question_calls():
+    client = _FakeAsyncOpenAI(delay=0.02)
+    questions = [
+        DetectedQuestion(question_number=n, question_text="כתוב מחלקה", sub_questions=["א", "ב", "ג"])
+        for n in (1, 2, 3)
+    ]
+
+    with patch.object(rubric_generator_service, "get_async_openai_client", return_value=client), \
+            patch.object(rubric_generator_service.settings, "rubric_max_concurrency", 2):
+        rubric = await generate_full_rubric(questions)
+
+    assert client.live_calls == 9
+    assert client.max_in_flight == 2
+    assert all(len(q.sub_questions) == 3 for q in rubric.questions)
+
+
+async def test_generate_full_rubric_batch_falls_back_live_for_failed_lines():
+    client = _FakeAsyncOpenAI(batch_skip={"q1"})
+    with patch.object(rubric_generator_service, "get_async_openai_client", return_value=client):
+        rubric = await generate_full_rubric_batch(_questions(), poll_seconds=0)
+
+    assert [line["custom_id"] for line in client.batch_lines] == ["q0", "q1", "q2"]
+    assert client.batch_lines[0]["body"]["response_format"] == {"type": "json_object"}
+    # Only the failed batch line was generated live
+    assert client.live_calls == 1
+    assert [q.question_number for q in rubric.questions] == [1, 2, 3]
+    assert [q.total_points for q in rubric.questions] == [20, 15, 10]
+    assert all(q.extraction_status == "success" for q in rubric.questions)
+
+
+async def test_generate_full_rubric_batch_matches_live_sub_questions():
+    client = _FakeAsyncOpenAI(batch_skip={"q0-s1"}, delay=0.02)
+    questions = [
+        DetectedQuestion(question_number=1, question_text="כתוב מחלקה", sub_questions=["א", "ב", "ג"]),
+        DetectedQuestion(question_number=2, question_text="כתוב לולאה", teacher_points=5),
+    ]
+
+    with patch.object(rubric_generator_service, "get_async_openai_client", return_value=client):
+        batch = await generate_full_rubric_batch(questions, poll_seconds=0)
+        fallback_calls = client.live_calls
+        live = await generate_full_rubric(questions)
+
+    assert [line["custom_id"] for line in client.batch_lines] == ["q0-s0", "q0-s1", "q0-s2", "q1"]
+    # The failed sub-question line was generated live, alone
+    assert fallback_calls == 1
+    assert batch.questions == live.questions
+
+
+async def test_generate_full_rubric_batch_limits_live_fallback_concurrency():
+    client = _FakeAsyncOpenAI(batch_skip={"q0", "q1", "q2"}, delay=0.02)
+    with patch.object(rubric_generator_service, "get_async_openai_client", return_value=client), \
+            patch.object(rubric_generator_service.settings, "rubric_max_concurrency", 2):
+        await generate_full_rubric_batch(_questions(), poll_seconds=0)
+
+    assert client.live_calls == 3
+    assert client.max_in_flight == 2
+
+
+async def test_rate_limiter_waits_for_tokens_and_retry_after():
+    limiter = _RateLimiter(requests_per_minute=6000, tokens_per_minute=600)  # 10 tokens/s
+
+    start = time.monotonic()
+    await limiter.acquire(600)  # the full bucket is available at once
+    assert time.monotonic() - start < 0.05
+
+    await limiter.acquire(3)  # then paced by the refill rate
+    assert time.monotonic() - start >= 0.25
+
+    limiter.pause(0.2)
+    paused = time.monotonic()
+    await limiter.acquire(1)
+    assert time.monotonic() - paused >= 0.2
+
+
+async def test_identical_request_is_served_from_cache(tmp_path):
+    client = _FakeAsyncOpenAI()
+    cache = _RubricCache(str(tmp_path), ttl_seconds=3600)
+    question = DetectedQuestion(question_number=1, question_text="כתוב פעולה", page_indexes=[0])
+    rerun = DetectedQuestion(question_number=1, question_text="כתוב פעולה", page_indexes=[3])
+
+    with patch.object(rubric_generator_service, "get_async_openai_client", return_value=client), \
+            patch.object(rubric_generator_service, "_get_rubric_cache", return_value=cache):
+        first = await generate_criteria_for_question(question, 20)
+        hit = await generate_criteria_for_question(rerun, 20)
+        other_points = await generate_criteria_for_question(rerun, 25)
+        refreshed = await regenerate_single_question(1, "כתוב פעולה", [], 20)
+
+    # The hit is rebuilt for the asking question; points and refresh miss
+    assert client.live_calls == 3
+    assert first.criteria == hit.criteria
+    assert hit.source_pages == [3]
+    assert other_points.total_points == 25
+    assert refreshed.total_points == 20
+
+
+async def test_prompt_change_misses_the_cache(tmp_path):
+    client = _FakeAsyncOpenAI()
+    cache = _RubricCache(str(tmp_path), ttl_seconds=3600)
+    question = DetectedQuestion(question_number=1, question_text="כתוב פעולה")
+    parts = [part + " " for part in rubric_generator_service._RUBRIC_PROMPT_PARTS]
+
+    with patch.object(rubric_generator_service, "get_async_openai_client", return_value=client), \
+            patch.object(rubric_generator_service, "_get_rubric_cache", return_value=cache):
+        await generate_criteria_for_question(question, 20)
+        with patch.object(rubric_generator_service, "_RUBRIC_PROMPT_PARTS", parts):
+            await generate_criteria_for_question(question, 20)
+
+    assert client.live_calls == 2
+
+
+def test_json_object_scanner_ignores_braces_in_strings():
+    scanner = _JsonObjectScanner()
+    text = '```json\n{"a": "if (x) { y(\\"}\\"); }", "b": {"c": 1}}\n```'
+
+    done = [scanner.feed(text[i:i + 5]) for i in range(0, len(text), 5)]
+
+    assert done.index(True) == (text.index("}}") + 1) // 5
+    assert text[:scanner.end].endswith('{"c": 1}}')
+    assert json.loads(text[text.index("{"):scanner.end])["b"] == {"c": 1}
+
+
+async def test_stream_stops_reading_after_json_closes():
+    client = _FakeAsyncOpenAI(trailer="\n\nהערות: " + "x" * 200)
+    question = DetectedQuestion(question_number=1, question_text="כתוב פעולה")
+
+    with patch.object(rubric_generator_service, "get_async_openai_client", return_value=client):
+        result = await generate_criteria_for_question(question, 20)
+
+    stream = client.streams[0]
+    assert result.extraction_status == "success" and result.total_points == 20
+    assert stream.closed and stream.read < len(stream.chunks)
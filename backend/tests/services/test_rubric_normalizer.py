@@ -0,0 +1,89 @@
+"""
+Tests for rubric_normalizer.normalize_rubric.
+"""
+
+from app.services.rubric_normalizer import denormalize_to_legacy, iter_normalize_rubric, normalize_rubric
+
+
+def _rubric():
+    return {
+        "name": "מבחן",
+        "programming_language": "java",
+        "questions": [
+            {
+                "question_number": 1,
+                "question_text": "כתוב פעולה",
+                "criteria": [
+                    {
+                        "criterion_description": "חתימה נכונה",
+                        "total_points": 4,
+                        "reduction_rules": [
+                            {"description": "שם שגוי", "reduction_value": 1, "is_explicit": False},
+                            {"reduction_value": "3"},
+                        ],
+                    },
+                    {"description": "לולאה", "points": 6},
+                    {"criterion_description": "ערך מוחזר", "total_points": 2},
+                ],
+            },
+            {
+                "question_number": 2,
+                "sub_questions": [
+                    {"sub_question_id": "א", "criteria": [{"description": "בנאי", "points": 5}]},
+                    {"criteria": [{"criterion_description": "toString", "total_points": 3}]},
+                ],
+            },
+        ],
+    }
+
+
+def test_normalize_rubric_converts_every_criterion_format():
+    rubric = normalize_rubric(_rubric())
+    q1, q2 = rubric.questions
+
+    enhanced, legacy, synthetic = q1.criteria
+    assert [(r.index, r.description, r.deduction_points, r.is_explicit) for r in enhanced.rules] == [
+        (0, "שם שגוי", 1.0, False),
+        (1, "כלל 2", 3.0, True),
+    ]
+    assert (legacy.source_format, legacy.total_points, legacy.rules[0].description) == ("legacy", 6.0, "לולאה")
+    # Enhanced criterion without rules gets one all-or-nothing rule
+    assert [(r.description, r.deduction_points, r.is_explicit) for r in synthetic.rules] == [("ערך מוחזר", 2.0, False)]
+
+    assert [sq.sub_question_id for sq in q2.sub_questions] == ["א", "sub_1"]
+    assert [sq.total_points for sq in q2.sub_questions] == [5.0, 3.0]
+
+    assert (rubric.total_points, rubric.total_criteria, rubric.total_rules) == (20.0, 5, 6)
+
+
+def test_denormalize_to_legacy_flattens_sub_question_criteria():
+    legacy = denormalize_to_legacy(normalize_rubric(_rubric()))
+
+    assert [q["total_points"] for q in legacy["questions"]] == [12.0, 8.0]
+    assert legacy["questions"][1]["criteria"] == [
+        {"description": "בנאי", "points": 5.0},
+        {"description": "toString", "points": 3.0},
+    ]
+
+
+def test_stored_totals_match_recompute_after_mutation():
+    rubric = normalize_rubric(_rubric())
+    totals = (rubric.total_points, rubric.total_criteria, rubric.total_rules)
+
+    rubric.recompute()
+    assert (rubric.total_points, rubric.total_criteria, rubric.total_rules) == totals
+
+    rubric.questions.pop()
+    rubric.recompute()
+    assert (rubric.total_points, rubric.total_criteria, rubric.total_rules) == (12.0, 3, 4)
+
+
+def test_iter_normalize_rubric_yields_questions_lazily():
+    raw = _rubric()
+    raw["questions"].append({"question_number": 3, "criteria": None})  # would fail to normalize
+
+    questions = iter_normalize_rubric(raw)
+    first = next(questions)
+
+    assert (first.question_number, first.total_points) == (1, 12.0)
+    assert next(questions).sub_questions[0].sub_question_id == "א"
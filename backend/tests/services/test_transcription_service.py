@@ -6,16 +6,38 @@ needed_grounding_retry) are correctly populated through the grounded path.
 These tests call _merge_grounded_results and _transcribe_page_grounded
 directly — no PDF or real VLM needed.
 """
+import asyncio
+import base64
+import io
 import json
+import threading
 from unittest.mock import patch
 
 import pytest
 
 from app.services.handwriting_transcription_service import (
+    CachedVLMProvider,
+    GROUNDED_TRANSCRIPTION_PROMPT,
     HandwritingTranscriptionService,
+    QuestionMapping,
     TranscribedAnswer,
     TranscriptionResult,
+    VLMBatchDispatcher,
+    VLM_HIGH_FIDELITY_MAX_SIZE,
+    VLM_MAX_SIZE,
     VLMProvider,
+    calculate_line_accuracy,
+    calculate_similarity,
+    count_equal_chars,
+    dice_ngram_similarity,
+    enhance_for_transcription,
+    grounded_page_prompt,
+    image_mime_type,
+    image_to_base64,
+    iter_answers_from_stream,
+    normalize_text,
+    scan_code,
+    similarity_upper_bound,
 )
 
 
@@ -164,3 +186,716 @@ def test_3_merge_behavior_unchanged():
     assert q2_sub.confidence == 0.88
     assert q2_sub.page_numbers == [1]
     assert q2_sub.needed_grounding_retry is False
+
+
+# ---------------------------------------------------------------------------
+# Test 4 — page payload encoding (JPEG default, PNG when lossless)
+# ---------------------------------------------------------------------------
+
+def test_4_image_payload_jpeg_by_default_png_when_lossless():
+    from PIL import Image
+
+    page = Image.new("RGB", (120, 80), "white")
+
+    jpeg_b64 = image_to_base64(page, enhance=False)
+    png_b64 = image_to_base64(page, enhance=False, lossless=True)
+
+    assert base64.b64decode(jpeg_b64)[:3] == b"\xff\xd8\xff"
+    assert image_mime_type(jpeg_b64) == "image/jpeg"
+    assert base64.b64decode(png_b64)[:8] == b"\x89PNG\r\n\x1a\n"
+    assert image_mime_type(png_b64) == "image/png"
+
+
+# ---------------------------------------------------------------------------
+# Test 5 — fused enhancement matches the chained PIL enhancers
+# ---------------------------------------------------------------------------
+
+def test_5_fused_enhancement_matches_chained_pil_reference():
+    from PIL import Image, ImageChops, ImageEnhance, ImageOps
+
+    noise = Image.effect_noise((200, 150), 60)
+    gradient = Image.linear_gradient("L").resize((200, 150))
+    page = Image.merge("RGB", [noise, noise.point(lambda v: v // 2 + 50), gradient])
+
+    reference = ImageOps.autocontrast(page, cutoff=1)
+    reference = ImageEnhance.Contrast(reference).enhance(1.4)
+    reference = ImageEnhance.Sharpness(reference).enhance(1.3)
+    reference = ImageEnhance.Brightness(reference).enhance(1.05)
+
+    fused = enhance_for_transcription(page)
+
+    hist = ImageChops.difference(reference, fused).convert("L").histogram()
+    assert max(v for v, count in enumerate(hist) if count) <= 8
+    assert sum(v * count for v, count in enumerate(hist)) / sum(hist) < 2
+
+
+# ---------------------------------------------------------------------------
+# Test 6 — on-disk VLM response cache
+# ---------------------------------------------------------------------------
+
+class _CountingLogprobProvider(FakeVLMProvider):
+    def transcribe_images_with_logprobs(self, images_b64, system_prompt, user_prompt, **kwargs):
+        return self.transcribe_images(images_b64, system_prompt, user_prompt), [-0.1, -0.2]
+
+
+def test_6_cached_provider_hits_bypasses_and_keeps_logprobs(tmp_path):
+    inner = _CountingLogprobProvider([{"n": 1}, {"n": 2}, {"n": 3}, {"n": 4}])
+    cached = CachedVLMProvider(inner, cache_dir=str(tmp_path))
+
+    first = cached.transcribe_images(["img"], "sys", "user")
+    again = cached.transcribe_images(["img"], "sys", "user")
+    assert first == again and inner._call_count == 1
+
+    # Different page payload → miss
+    cached.transcribe_images(["other"], "sys", "user")
+    assert inner._call_count == 2
+
+    # High temperature bypasses the cache entirely
+    cached.transcribe_images(["img"], "sys", "user", temperature=0.9)
+    assert inner._call_count == 3
+
+    text, logprobs = cached.transcribe_images_with_logprobs(["img"], "sys", "user")
+    text2, logprobs2 = cached.transcribe_images_with_logprobs(["img"], "sys", "user")
+    assert (text, logprobs) == (text2, logprobs2) == (text, [-0.1, -0.2])
+    assert inner._call_count == 4
+
+
+def test_7_cached_provider_hides_logprobs_when_inner_lacks_them(tmp_path):
+    cached = CachedVLMProvider(FakeVLMProvider([]), cache_dir=str(tmp_path))
+    assert not hasattr(cached, "transcribe_images_with_logprobs")
+
+
+# ---------------------------------------------------------------------------
+# Test 8 — incremental answers parsing from a token stream
+# ---------------------------------------------------------------------------
+
+def test_8_stream_parser_yields_each_answer_as_it_closes():
+    payload = json.dumps({
+        "transcription": {"answers": [
+            {"question_number": 1, "answer_text": "x = \"}]{\" [1]"},
+            {"question_number": 2, "answer_text": "print('ok')"},
+        ]},
+    })
+    text = "```json\n" + payload + "\n```"
+    chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+
+    consumed = []
+
+    def feed():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    stream = iter_answers_from_stream(feed())
+    first = next(stream)
+    assert first == {"question_number": 1, "answer_text": 'x = "}]{" [1]'}
+    assert len(consumed) < len(chunks)  # yielded before the stream finished
+    assert [a["question_number"] for a in stream] == [2]
+
+
+# ---------------------------------------------------------------------------
+# Test 9 — page size sent to the VLM
+# ---------------------------------------------------------------------------
+
+def test_9_pages_downsampled_to_provider_max_size():
+    from PIL import Image
+
+    page = Image.new("RGB", (1700, 2200), "white")
+    sent = Image.open(io.BytesIO(base64.b64decode(image_to_base64(page, enhance=False))))
+    assert max(sent.size) == VLM_MAX_SIZE
+
+    assert _make_service([]).max_image_size == VLM_MAX_SIZE
+    high = HandwritingTranscriptionService(vlm_provider=FakeVLMProvider([]), high_fidelity=True)
+    assert high.max_image_size == VLM_HIGH_FIDELITY_MAX_SIZE
+
+
+# ---------------------------------------------------------------------------
+# Test 10 — sparse pages batched into one VLM call
+# ---------------------------------------------------------------------------
+
+def _page(number, text):
+    return {
+        "visual_grounding": {"class_name": None, "method_names": [], "field_names": []},
+        "transcription": {
+            "student_name": None,
+            "page_number": number,
+            "answers": [
+                {"question_number": number, "sub_question_id": None, "answer_text": text, "confidence": 0.9},
+            ],
+        },
+    }
+
+
+def _sparse_page(size=(200, 280)):
+    """A white page with one short stroke: sparse, but not blank."""
+    from PIL import Image, ImageDraw
+
+    page = Image.new("RGB", size, "white")
+    width, height = size
+    ImageDraw.Draw(page).rectangle([width // 10, height // 14, width * 3 // 10, height // 14 + height // 100], fill="black")
+    return page
+
+
+def test_10_sparse_pages_batched_into_one_call():
+    from PIL import Image
+
+    pages = [image_to_base64(_sparse_page((200, 280 + n)), enhance=False) for n in (1, 2, 3)]
+    provider = FakeVLMProvider([
+        {"pages": [_page(2, "int y;"), _page(1, "int x;")]},
+        _page(3, "int z;"),
+    ])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    result = service._transcribe_all_pages(pages, "test.pdf", batch_size=2)
+
+    assert provider._call_count == 2
+    assert [(a.question_number, a.answer_text, a.page_numbers) for a in result.answers] == [
+        (1, "int x;", [1]),
+        (2, "int y;", [2]),
+        (3, "int z;", [3]),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Test 11 — async entry point overlaps page rendering with VLM calls
+# ---------------------------------------------------------------------------
+
+def test_11_transcribe_pdf_async_pipelines_render_and_vlm():
+    import asyncio
+    import threading
+    from PIL import Image
+
+    first_call_started = threading.Event()
+    overlapped = []
+
+    class _SignallingProvider(FakeVLMProvider):
+        def transcribe_images(self, *args, **kwargs):
+            first_call_started.set()
+            return super().transcribe_images(*args, **kwargs)
+
+    def render_page(pdf_bytes, page_number, dpi, max_size):
+        if page_number == 2:
+            # Page 1 is already at the VLM while page 2 is still rendering
+            overlapped.append(first_call_started.wait(timeout=5))
+        return _sparse_page((200, 280 + page_number))
+
+    provider = _SignallingProvider([_page(1, "int x;"), _page(2, "int y;")])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    with patch("app.services.handwriting_transcription_service.pdf_page_count", return_value=2), \
+         patch("app.services.handwriting_transcription_service.pdf_page_to_image",
+               side_effect=render_page) as render:
+        result = asyncio.run(service.transcribe_pdf_async(b"%PDF", "test.pdf", dpi=150, batch_size=1))
+
+    assert render.call_args_list[0].args == (b"%PDF", 1, 150, VLM_MAX_SIZE)
+    assert overlapped == [True]
+    assert sorted(a.answer_text for a in result.answers) == ["int x;", "int y;"]
+
+
+def test_11b_pages_measured_off_the_event_loop():
+    from app.services import handwriting_transcription_service as hts
+
+    measured_on = []
+    page_ink_ratio = hts.page_ink_ratio.__wrapped__
+
+    def ink_ratio(page_b64):
+        measured_on.append(threading.get_ident())
+        return page_ink_ratio(page_b64)
+
+    provider = FakeVLMProvider([_page(1, "int x;"), _page(2, "int y;")])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        with patch.object(hts, "pdf_page_count", return_value=2), \
+             patch.object(hts, "pdf_page_to_image", side_effect=lambda *a: _sparse_page((200, 280 + a[1]))), \
+             patch.object(hts, "page_ink_ratio", side_effect=ink_ratio):
+            result = await service.transcribe_pdf_async(b"%PDF", "test.pdf")
+        return loop_thread, result
+
+    loop_thread, result = asyncio.run(run())
+
+    assert measured_on and loop_thread not in measured_on
+    assert sorted(a.answer_text for a in result.answers) == ["int x;", "int y;"]
+
+
+# ---------------------------------------------------------------------------
+# Test 13 — clean scans skip enhancement
+# ---------------------------------------------------------------------------
+
+def test_13_clean_scan_skips_enhancement():
+    from PIL import Image, ImageDraw
+
+    clean = Image.new("RGB", (800, 1100), "white")
+    draw = ImageDraw.Draw(clean)
+    for y in range(100, 1000, 40):
+        draw.line([(80, y), (700, y)], fill="black", width=3)
+    assert enhance_for_transcription(clean) is clean
+
+    faded = Image.new("RGB", (800, 1100), (190, 190, 190))
+    ImageDraw.Draw(faded).line([(80, 500), (700, 500)], fill=(110, 110, 110), width=3)
+    assert enhance_for_transcription(faded) is not faded
+
+
+# ---------------------------------------------------------------------------
+# Test 15 — ink-scaled max_tokens, full budget after a truncated reply
+# ---------------------------------------------------------------------------
+
+class _BudgetRecordingProvider(FakeVLMProvider):
+    def __init__(self, replies):
+        super().__init__([])
+        self._replies = iter(replies)
+        self.max_tokens_seen = []
+
+    def transcribe_images(self, images_b64, system_prompt, user_prompt, max_tokens=4000, **kwargs):
+        self.max_tokens_seen.append(max_tokens)
+        return next(self._replies)
+
+
+def test_15_sparse_page_budget_and_truncation_retry():
+    from PIL import Image
+
+    blank = image_to_base64(Image.new("RGB", (200, 280), "white"), enhance=False)
+    provider = _BudgetRecordingProvider(['{"visual_grounding": {"class_na', json.dumps(_page(1, "int x;"))])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    result = service._transcribe_page_grounded(blank, page_number=1)
+
+    assert provider.max_tokens_seen == [512, 4000]
+    assert result["transcription"]["answers"][0]["answer_text"] == "int x;"
+
+
+# ---------------------------------------------------------------------------
+# Test 16 — low image detail for blank pages when the provider supports it
+# ---------------------------------------------------------------------------
+
+class _DetailRecordingProvider(FakeVLMProvider):
+    supports_image_detail = True
+
+    def __init__(self, responses):
+        super().__init__(responses)
+        self.details = []
+
+    def transcribe_images(self, images_b64, system_prompt, user_prompt, detail="high", **kwargs):
+        self.details.append(detail)
+        return super().transcribe_images(images_b64, system_prompt, user_prompt, **kwargs)
+
+
+def test_16_blank_pages_sent_at_low_detail(tmp_path):
+    from PIL import Image, ImageDraw
+
+    blank = image_to_base64(Image.new("RGB", (400, 560), "white"), enhance=False)
+    written = Image.new("RGB", (400, 560), "white")
+    ImageDraw.Draw(written).rectangle([40, 40, 360, 200], fill="black")
+    written = image_to_base64(written, enhance=False)
+
+    inner = _DetailRecordingProvider([_page(1, "a"), _page(2, "b"), _page(3, "c")])
+    service = HandwritingTranscriptionService(vlm_provider=inner)
+    service._transcribe_page_grounded(blank, page_number=1)
+    service._transcribe_page_grounded(written, page_number=2)
+    assert inner.details == ["low", "high"]
+
+    # Options pass through the response cache (and are part of its key)
+    cached = HandwritingTranscriptionService(
+        vlm_provider=CachedVLMProvider(inner, cache_dir=str(tmp_path))
+    )
+    cached._transcribe_page_grounded(blank, page_number=3)
+    assert inner.details[-1] == "low"
+
+
+# ---------------------------------------------------------------------------
+# Test 17 — one call per page by default, all pages in one call on request
+# ---------------------------------------------------------------------------
+
+def test_17_all_pages_in_one_call_when_batch_size_is_none():
+    from PIL import Image
+
+    pages = [image_to_base64(_sparse_page((200, 280 + n))) for n in (1, 2, 3)]
+    provider = FakeVLMProvider([{"pages": [_page(n, f"line {n}") for n in (1, 2, 3)]}])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    result = service._transcribe_all_pages(pages, "test.pdf", batch_size=None)
+
+    assert provider._call_count == 1
+    assert [a.page_numbers for a in result.answers] == [[1], [2], [3]]
+
+
+def test_17b_default_path_keeps_logprob_signal():
+    from app.services.transcription_adapter import build_transcription_draft
+
+    pages = [image_to_base64(_sparse_page((200, 280 + n))) for n in (1, 2)]
+    provider = _CountingLogprobProvider([_page(1, "int x;"), _page(2, "int y;")])
+    provider.transcribe_images_with_logprobs = (
+        lambda images_b64, system_prompt, user_prompt, **kwargs:
+        (provider.transcribe_images(images_b64, system_prompt, user_prompt), [-0.1, -3.5, -0.2])
+    )
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    result = service._transcribe_all_pages(pages, "test.pdf")
+
+    assert provider._call_count == 2
+    assert [a.min_span_logprob for a in result.answers] == [-3.5, -3.5]
+    draft = build_transcription_draft(result, page_count=2, model_version="fake", duration_ms=0)
+    assert "vlm_low_logprob" in [a.annotation_type for a in draft.annotations]
+
+
+# ---------------------------------------------------------------------------
+# Test 18 — dispatcher shares one VLM call across concurrent PDFs
+# ---------------------------------------------------------------------------
+
+def test_18_dispatcher_batches_pages_across_pdfs():
+    from PIL import Image
+
+    page_a = image_to_base64(_sparse_page())
+    page_b = image_to_base64(_sparse_page((210, 280)))
+    students = {page_a: "student A", page_b: "student B"}
+
+    class _PerImageProvider(FakeVLMProvider):
+        # Pages are measured in worker threads, so either PDF may queue first
+        def transcribe_images(self, images_b64, system_prompt, user_prompt, **kwargs):
+            self._call_count += 1
+            pages = [dict(_page(1, students[b64]), image_index=idx) for idx, b64 in enumerate(images_b64, 1)]
+            return json.dumps({"pages": pages[::-1]})
+
+    provider = _PerImageProvider([])
+    dispatcher = VLMBatchDispatcher(provider, max_batch_size=2, max_wait=5)
+    service_a = HandwritingTranscriptionService(dispatcher=dispatcher)
+    service_b = HandwritingTranscriptionService(dispatcher=dispatcher)
+
+    async def run_both():
+        return await asyncio.gather(
+            service_a._transcribe_all_pages_async([page_a], "a.pdf"),
+            service_b._transcribe_all_pages_async([page_b], "b.pdf"),
+        )
+
+    result_a, result_b = asyncio.run(run_both())
+
+    assert provider._call_count == 1
+    assert [a.answer_text for a in result_a.answers] == ["student A"]
+    assert [a.answer_text for a in result_b.answers] == ["student B"]
+
+
+# ---------------------------------------------------------------------------
+# Test 19 — fused code scan matches the separate checks
+# ---------------------------------------------------------------------------
+
+def test_19_scan_code_matches_separate_checks():
+    code = "public class Student { void getname() { this.name = name; this.age = 3; } void abc() {} }"
+    names = ["getName", "name", "get", "ab", "bc", "missing", "", None]
+
+    scan = scan_code(code, names)
+
+    assert scan.class_name == "Student"
+    assert scan.assignments == [("name", "name"), ("age", "3")]
+    assert scan.found_identifiers == {n.lower() for n in names if n and n.lower() in code.lower()}
+    # "this." hidden inside an identifier match is still reported
+    assert scan_code("x this.a = b", ["x this"]).assignments == [("a", "b")]
+    assert scan_code("", []).class_name is None
+
+
+# ---------------------------------------------------------------------------
+# Test 20 — debug page dumps are opt-in, per PDF, from the rendered pages
+# ---------------------------------------------------------------------------
+
+def test_20_debug_pages_written_only_when_enabled(tmp_path, monkeypatch):
+    from PIL import Image
+
+    monkeypatch.chdir(tmp_path)
+    pages = [Image.new("RGB", (40, 60), "white"), Image.new("RGB", (40, 60), "black")]
+
+    monkeypatch.delenv("PUPAL_DEBUG_VLM", raising=False)
+    assert _make_service([])._save_debug_pages(pages, "exam.pdf") is None
+
+    monkeypatch.setenv("PUPAL_DEBUG_VLM", "1")
+    _make_service([])._save_debug_pages(pages, "exam.pdf").result()
+    written = sorted((tmp_path / "debug_handwritten_pages" / "exam_pdf").glob("*.png"))
+    assert [p.name for p in written] == ["page_1.png", "page_2.png"]
+    assert Image.open(written[1]).getpixel((0, 0)) == (0, 0, 0)
+
+
+# ---------------------------------------------------------------------------
+# Test 21 — pages are rendered at the VLM size, not downscaled afterwards
+# ---------------------------------------------------------------------------
+
+def test_21_pdf_rendered_at_vlm_size():
+    from PIL import Image
+
+    rendered = _sparse_page((1086, VLM_MAX_SIZE))
+    provider = FakeVLMProvider([_page(1, "x = 1;")])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    with patch(
+        "app.services.handwriting_transcription_service.convert_from_bytes",
+        return_value=[rendered],
+    ) as convert:
+        result = service.transcribe_pdf(b"%PDF", "exam.pdf")
+
+    assert convert.call_args.kwargs["size"] == VLM_MAX_SIZE
+    # Page ranges fan out across several pdftoppm processes
+    assert convert.call_args.kwargs["thread_count"] >= 1
+    assert [a.answer_text for a in result.answers] == ["x = 1;"]
+
+
+# ---------------------------------------------------------------------------
+# Test 22 — per-page prompt equals the fully formatted template
+# ---------------------------------------------------------------------------
+
+def test_22_grounded_page_prompt_matches_template():
+    context = "Student may have answered: שאלה 1, שאלה 2"
+    for page_number in (1, 7):
+        assert grounded_page_prompt(page_number, context) == GROUNDED_TRANSCRIPTION_PROMPT.format(
+            page_number=page_number, question_context=context,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Test 23 — streamed page stops at a class mismatch and retries right away
+# ---------------------------------------------------------------------------
+
+class _StreamingProvider(FakeVLMProvider):
+    """Streams its first response in small chunks, counting how many were read."""
+
+    def __init__(self, streamed, responses):
+        super().__init__(responses)
+        self._streamed = json.dumps(streamed)
+        self.chunks_read = 0
+
+    async def transcribe_images_stream_async(self, images_b64, system_prompt, user_prompt, **kwargs):
+        for start in range(0, len(self._streamed), 16):
+            self.chunks_read += 1
+            yield self._streamed[start:start + 16], [-0.1]
+
+
+def test_23_stream_stops_early_on_class_mismatch():
+    streamed = {
+        "visual_grounding": {"class_name": "Student", "method_names": [], "field_names": []},
+        "transcription": {"student_name": None, "page_number": 1, "answers": [
+            {"question_number": 1, "sub_question_id": None, "answer_text": "class Teacher {}", "confidence": 0.9},
+            {"question_number": 2, "sub_question_id": None, "answer_text": "x" * 2000, "confidence": 0.9},
+        ]},
+    }
+    retried = {
+        "visual_grounding": {"class_name": "Student", "method_names": [], "field_names": []},
+        "transcription": {"student_name": None, "page_number": 1, "answers": [
+            {"question_number": 1, "sub_question_id": None, "answer_text": "class Student {}", "confidence": 0.9},
+        ]},
+    }
+    provider = _StreamingProvider(streamed, [retried])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    result = service._transcribe_page_grounded("AAAA", page_number=1)
+
+    assert provider.chunks_read < len(json.dumps(streamed)) // 16 // 2
+    assert provider._call_count == 1
+    assert result["_needed_grounding_retry"] is True
+    assert result["transcription"]["answers"][0]["answer_text"] == "class Student {}"
+
+
+def test_23b_cached_streaming_provider_uses_the_response_cache(tmp_path):
+    page = {
+        "visual_grounding": {"class_name": None, "method_names": [], "field_names": []},
+        "transcription": {"student_name": None, "page_number": 1, "answers": [
+            {"question_number": 1, "sub_question_id": None, "answer_text": "int x;", "confidence": 0.9},
+        ]},
+    }
+    inner = _StreamingProvider(page, [page])
+    cached = CachedVLMProvider(inner, cache_dir=str(tmp_path))
+    assert not hasattr(cached, "transcribe_images_stream_async")
+
+    for _ in range(2):
+        service = HandwritingTranscriptionService(vlm_provider=cached)
+        result = service._transcribe_page_grounded("AAAA", page_number=1)
+        assert result["transcription"]["answers"][0]["answer_text"] == "int x;"
+
+    # Never streamed; the second service is answered from the cache
+    assert inner.chunks_read == 0
+    assert inner._call_count == 1
+
+
+# ---------------------------------------------------------------------------
+# Test 24 — markdown fences stripped before parsing
+# ---------------------------------------------------------------------------
+
+def test_24_parse_json_strips_markdown_fences():
+    parse = HandwritingTranscriptionService._parse_json
+
+    assert parse('```json\n{"a": 1}\n```') == {"a": 1}
+    assert parse('```\njson {"a": [1, 2]}\n```  ') == {"a": [1, 2]}
+    assert parse('```json\n{"a": "x\\ny"}') == {"a": "x\ny"}
+    assert parse('{"a": 2}') == {"a": 2}
+    assert parse("```") == {}
+
+
+# ---------------------------------------------------------------------------
+# Test 25 — blank pages never reach the VLM
+# ---------------------------------------------------------------------------
+
+def test_25_blank_pages_skip_the_vlm():
+    from PIL import Image
+
+    blank = image_to_base64(Image.new("RGB", (200, 280), "white"))
+    written = image_to_base64(_sparse_page())
+    provider = FakeVLMProvider([_page(2, "int x;")])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    result = service._transcribe_all_pages([blank, written, blank], "test.pdf")
+
+    assert provider._call_count == 1
+    assert [(a.answer_text, a.page_numbers) for a in result.answers] == [("int x;", [2])]
+
+
+# ---------------------------------------------------------------------------
+# Test 26 — identical pages are transcribed once
+# ---------------------------------------------------------------------------
+
+def test_26_identical_pages_transcribed_once():
+    page = image_to_base64(_sparse_page())
+    other = image_to_base64(_sparse_page((210, 280)))
+    provider = FakeVLMProvider([
+        {"pages": [_page(1, "int x;"), _page(2, "int y;")]},
+    ])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    result = service._transcribe_all_pages([page, other, page], "a.pdf", batch_size=None)
+
+    assert provider._call_count == 1
+    # Page 3 gets page 1's answer, as if it had been transcribed on its own
+    assert [(a.answer_text, a.page_numbers) for a in result.answers] == [
+        ("int x;\nint x;", [1, 3]),
+        ("int y;", [2]),
+    ]
+
+    # A later PDF through the same service reuses the cached page
+    again = service._transcribe_all_pages([page], "b.pdf")
+    assert provider._call_count == 1
+    assert [a.answer_text for a in again.answers] == ["int x;"]
+
+
+# Test 27 — sync providers run on the dedicated, bounded VLM call pool
+# Test 27 — sync providers run on the shared, bounded worker pool
+# ---------------------------------------------------------------------------
+
+def test_27_sync_provider_calls_share_one_worker_pool():
+    threads = []
+
+    class RecordingProvider(FakeVLMProvider):
+        def transcribe_images(self, images_b64, system_prompt, user_prompt, **kwargs):
+            threads.append(threading.current_thread().name)
+            return super().transcribe_images(images_b64, system_prompt, user_prompt, **kwargs)
+
+    provider = RecordingProvider([_page(1, "int x;"), _page(1, "int y;")])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+
+    service._transcribe_all_pages([image_to_base64(_sparse_page())], "a.pdf")
+    service._transcribe_all_pages([image_to_base64(_sparse_page((210, 280)))], "b.pdf")
+
+    assert len(threads) == 2
+    assert all(name.startswith("vlm-call") for name in threads)
+
+
+# ---------------------------------------------------------------------------
+# Test 28 — mappings that share pages are transcribed in one call
+# ---------------------------------------------------------------------------
+
+def test_28_mappings_on_shared_pages_grouped_into_one_call():
+    provider = FakeVLMProvider([
+        {"student_name": "Dana"},
+        {"answers": [
+            {"question_number": 1, "sub_question_id": "ב", "answer_text": "int b;"},
+            {"question_number": 1, "sub_question_id": "א", "answer_text": "int a;"},
+        ]},
+        {"answer_text": "int c;"},
+    ])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+    mappings = [
+        QuestionMapping(question_number=1, sub_question_id="א", page_indexes=[0]),
+        QuestionMapping(question_number=2, page_indexes=[1]),
+        QuestionMapping(question_number=1, sub_question_id="ב", page_indexes=[0]),
+    ]
+
+    result = service._transcribe_with_mappings(["p0", "p1"], "a.pdf", mappings)
+
+    assert provider._call_count == 3
+    assert [(a.question_number, a.sub_question_id, a.answer_text) for a in result.answers] == [
+        (1, "א", "int a;"),
+        (2, None, "int c;"),
+        (1, "ב", "int b;"),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Test 29 — questions missing from a grouped reply are transcribed singly
+# ---------------------------------------------------------------------------
+
+def test_29_grouped_call_falls_back_for_missing_answers():
+    provider = FakeVLMProvider([
+        {"student_name": None},
+        {"answers": [{"question_number": 1, "sub_question_id": "א", "answer_text": "int a;"}]},
+        {"answer_text": "int b;"},
+    ])
+    service = HandwritingTranscriptionService(vlm_provider=provider)
+    mappings = [
+        QuestionMapping(question_number=1, sub_question_id="א", page_indexes=[0]),
+        QuestionMapping(question_number=1, sub_question_id="ב", page_indexes=[0]),
+    ]
+
+    result = service._transcribe_with_mappings(["p0"], "a.pdf", mappings)
+
+    assert provider._call_count == 3
+    assert [a.answer_text for a in result.answers] == ["int a;", "int b;"]
+
+
+# ---------------------------------------------------------------------------
+# Test 30 — accuracy metrics
+# ---------------------------------------------------------------------------
+
+def test_30_accuracy_metrics():
+    truth = "".join(f"class A{i} {{\n    int x = {i};\n}}\n" for i in range(1, 41))
+    transcribed = "\n\n" + truth.replace("x = 1", "x = 7", 3) + "\n"
+
+    nt_trans, nt_truth = normalize_text(transcribed), normalize_text(truth)
+    assert nt_trans.text == transcribed.strip("\n")
+    assert nt_trans.lines == tuple(nt_trans.text.split("\n"))
+
+    # Raw and pre-normalized inputs score the same
+    similarity = calculate_similarity(transcribed, truth)
+    assert similarity == calculate_similarity(nt_trans, nt_truth)
+    assert 0.99 < similarity < 1.0
+    assert calculate_similarity(truth, truth + "\n\n") == 1.0
+    # A shared last line has no newline to match, so a prefix scores below 1
+    assert calculate_similarity("int x;\n}", "int x;\n}\n}") == pytest.approx(2 * 8 / 18)
+    assert dice_ngram_similarity(nt_trans, nt_truth) == pytest.approx(similarity, abs=0.01)
+
+    line_accuracy, diff = calculate_line_accuracy(nt_trans, nt_truth)
+    assert line_accuracy == pytest.approx(1 - 3 / 120)
+    assert "-    int x = 10;" in diff and "+    int x = 70;" in diff
+
+    # Position-wise character matches, same as the naive count
+    text1, text2 = nt_trans.text, "X" + nt_truth.text[1:600]
+    assert count_equal_chars(text1, text2) == sum(a == b for a, b in zip(text1, text2))
+
+
+def test_30b_accuracy_report_never_scores_by_the_bound():
+    from types import SimpleNamespace
+
+    # Aliased so pytest does not collect the CLI helper as a test
+    from app.services.handwriting_transcription_service import test_transcription_accuracy as accuracy_report
+
+    truth = "".join(f"class A{i} {{\n    int x = {i};\n}}\n" for i in range(1, 21))
+
+    def report(transcribed):
+        answer = SimpleNamespace(answer_text=transcribed, question_number=1)
+        service = SimpleNamespace(
+            transcribe_pdf_path=lambda path, dpi: SimpleNamespace(student_name="x", answers=[answer]),
+            vlm_provider=SimpleNamespace(name="fake"),
+        )
+        return accuracy_report(service, "x.pdf", truth)
+
+    poor = report("print('hello')")
+    assert poor["metrics"]["overall_similarity"] is None
+    assert poor["metrics"]["similarity_upper_bound"] == similarity_upper_bound("print('hello')", truth)
+    assert not poor["passed"]
+
+    close = report(truth.replace("x = 1", "x = 7", 1))
+    assert close["metrics"]["overall_similarity"] == calculate_similarity(truth.replace("x = 1", "x = 7", 1), truth)
+    assert close["passed"]